@@ -0,0 +1,145 @@
+"""内存缓存写入延迟基准测试
+
+对比原实现（dict + 时间戳 dict，每次写入全量扫描清理过期条目）与 TTLCache
+在不同缓存规模下的单次写入延迟。TTLCache 的延迟应不随条目数增长。
+时钟使用模拟时间，每次写入前进 1 秒，让过期清理路径持续被触发。
+
+用法:
+    python benchmarks/cache_insert.py [--entries 100000] [--legacy-samples 50]
+"""
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+from datetime import datetime, timedelta
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.cache import TTLCache  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LegacyCache:
+    """重现原实现：_save_to_cache 每次调用 _clean_expired_cache 扫描全部时间戳"""
+
+    def __init__(self, ttl_minutes: int):
+        self.cache_ttl = ttl_minutes
+        self._cache = {}
+        self._cache_timestamps = {}
+
+    def set(self, key, value):
+        self._cache[key] = value
+        self._cache_timestamps[key] = datetime.now()
+        now = datetime.now()
+        expired_keys = [
+            k for k, timestamp in self._cache_timestamps.items()
+            if now - timestamp >= timedelta(minutes=self.cache_ttl)
+        ]
+        for k in expired_keys:
+            self._cache.pop(k, None)
+            self._cache_timestamps.pop(k, None)
+
+
+def sample_result(i: int) -> dict:
+    return {
+        'status': 'success',
+        'url': f'https://www.youtube.com/watch?v={i:011d}',
+        'video_id': f'{i:011d}',
+        'path': f'/subtitles/{i:011d}.en.ttml',
+        'type': 'normal'
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def bench_ttl(entries: int, buckets: int):
+    """顺序写入 entries 个条目（有效期大于总时长，缓存规模持续增长），按规模分段统计延迟"""
+    clock = FakeClock()
+    cache = TTLCache(entries * 2, clock=clock)
+    step = entries // buckets
+    rows = []
+    timings = []
+    for i in range(entries):
+        clock.now += 1
+        value = sample_result(i)
+        started = time.perf_counter_ns()
+        cache.set(f'{i:011d}:en:None', value)
+        timings.append(time.perf_counter_ns() - started)
+        if (i + 1) % step == 0:
+            rows.append((i + 1, statistics.median(timings) / 1000, percentile(timings, 0.99) / 1000))
+            timings = []
+    return rows
+
+
+def bench_ttl_steady(entries: int):
+    """稳态：缓存保持 entries 个条目，每次写入同时过期一个最旧的条目"""
+    clock = FakeClock()
+    cache = TTLCache(entries, clock=clock)
+    for i in range(entries):
+        clock.now += 1
+        cache.set(i, sample_result(i))
+    timings = []
+    for i in range(entries, entries * 2):
+        clock.now += 1
+        value = sample_result(i)
+        started = time.perf_counter_ns()
+        cache.set(i, value)
+        timings.append(time.perf_counter_ns() - started)
+    return len(cache), statistics.median(timings) / 1000, percentile(timings, 0.99) / 1000
+
+
+def bench_legacy(sizes, samples: int):
+    """在不同缓存规模下测量原实现的单次写入延迟"""
+    rows = []
+    for size in sizes:
+        cache = LegacyCache(ttl_minutes=30)
+        for i in range(size):
+            cache._cache[i] = sample_result(i)
+            cache._cache_timestamps[i] = datetime.now()
+        timings = []
+        for i in range(size, size + samples):
+            value = sample_result(i)
+            started = time.perf_counter_ns()
+            cache.set(i, value)
+            timings.append(time.perf_counter_ns() - started)
+        rows.append((size, statistics.median(timings) / 1000, percentile(timings, 0.99) / 1000))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000, help='缓存条目数')
+    parser.add_argument('--buckets', type=int, default=10, help='统计分段数')
+    parser.add_argument('--legacy-samples', type=int, default=50, help='原实现每个规模的采样写入次数，0 表示跳过')
+    args = parser.parse_args()
+
+    print(f"TTLCache 写入延迟（顺序写入 {args.entries} 个条目）")
+    print(f"{'entries':>10} {'p50 us':>10} {'p99 us':>10}")
+    for size, p50, p99 in bench_ttl(args.entries, args.buckets):
+        print(f"{size:>10} {p50:>10.2f} {p99:>10.2f}")
+
+    size, p50, p99 = bench_ttl_steady(args.entries)
+    print(f"\nTTLCache 稳态写入+过期（保持 {size} 个条目）: p50 {p50:.2f} us, p99 {p99:.2f} us")
+
+    if args.legacy_samples:
+        sizes = [args.entries // 100, args.entries // 10, args.entries // 2, args.entries]
+        print(f"\n原实现写入延迟（每个规模 {args.legacy_samples} 次写入）")
+        print(f"{'entries':>10} {'p50 us':>10} {'p99 us':>10}")
+        for size, p50, p99 in bench_legacy(sizes, args.legacy_samples):
+            print(f"{size:>10} {p50:>10.2f} {p99:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
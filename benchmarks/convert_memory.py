@@ -0,0 +1,116 @@
+"""转换与响应路径的内存基准测试
+
+对不同长度的合成 TTML 字幕，在独立子进程中执行
+「全文索引 + TTML → JSON 转换 + 时间窗口切片 + 响应编码」，记录进程峰值 RSS。
+streaming 模式（当前实现）的峰值应基本保持不变，
+legacy 模式（整体解析后写入索引 + json.dump + jsonify）随输入线性增长。
+
+用法:
+    python benchmarks/convert_memory.py [--sizes 10000,100000,400000]
+"""
+import os
+import sys
+import json
+import resource
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def generate_ttml(path: Path, cues: int):
+    """流式生成合成 TTML 文件"""
+    with path.open('w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        f.write('<tt xmlns="http://www.w3.org/ns/ttml"><body><div>\n')
+        for i in range(cues):
+            start, end = i * 2000, i * 2000 + 1900
+            f.write(
+                f'<p begin="{start // 3600000:02d}:{start // 60000 % 60:02d}:{start // 1000 % 60:02d}.{start % 1000:03d}" '
+                f'end="{end // 3600000:02d}:{end // 60000 % 60:02d}:{end // 1000 % 60:02d}.{end % 1000:03d}">'
+                f'subtitle line {i} with some "quoted" text &amp; unicode 字幕</p>\n'
+            )
+        f.write('</div></body></tt>\n')
+
+
+def run_streaming(ttml_path: Path):
+    from src.cues import load_track, render_json
+    from src.subtitle import SubtitleProcessor
+    from src.search_index import SubtitleSearchIndex
+    from src.streaming import FileContent, _buffered, iter_encode
+
+    SubtitleSearchIndex(ttml_path.with_suffix('.streaming.db')).index_file(ttml_path)
+    converted = SubtitleProcessor()._convert_to_json(ttml_path)
+    # 切片（10 分钟窗口），轨道索引留在缓存中
+    render_json(load_track(ttml_path).slice_time(3600 * 1000, 4200 * 1000))
+    body = {'status': 'success', 'results': [{
+        'content': FileContent(ttml_path),
+        'converted_content': FileContent(converted)
+    }]}
+    with open(os.devnull, 'wb') as out:
+        for block in _buffered(iter_encode(body)):
+            out.write(block)
+
+
+def run_legacy(ttml_path: Path):
+    """重现原实现：解析全部字幕后写入索引，ET.fromstring + 列表 + json.dump(indent=2)，读回字符串后再整体序列化"""
+    import xml.etree.ElementTree as ET
+    from src.cues import parse_cues_file
+    from src.search_index import SubtitleSearchIndex
+
+    cues = parse_cues_file(ttml_path)
+    SubtitleSearchIndex(ttml_path.with_suffix('.legacy.db')).index_cues('bench', 'en', cues)
+    del cues
+    content = ttml_path.read_text(encoding='utf-8')
+    root = ET.fromstring(content)
+    entries = []
+    for i, elem in enumerate(root.findall('.//{*}p'), 1):
+        text = ''.join(elem.itertext()).strip()
+        if text:
+            entries.append({'index': i, 'start': elem.get('begin'), 'end': elem.get('end'), 'text': text})
+    converted = json.dumps(entries, ensure_ascii=False, indent=2)
+    body = json.dumps({'status': 'success', 'results': [{'content': content, 'converted_content': converted}]})
+    with open(os.devnull, 'w') as out:
+        out.write(body)
+
+
+def child(mode: str, ttml_path: str):
+    {'streaming': run_streaming, 'legacy': run_legacy}[mode](Path(ttml_path))
+    # Linux 下 ru_maxrss 单位为 KB
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,50000,200000,400000', help='字幕条数，逗号分隔')
+    parser.add_argument('--modes', default='streaming,legacy')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, TEMP_DIR=tmp, SUBTITLE_DIR=tmp)
+        print(f"{'cues':>10} {'TTML MB':>9} " + ' '.join(f"{m + ' RSS MB':>18}" for m in args.modes.split(',')))
+        for size in (int(s) for s in args.sizes.split(',')):
+            ttml_path = Path(tmp) / f"bench{size:07d}.en.ttml"
+            generate_ttml(ttml_path, size)
+            row = f"{size:>10} {ttml_path.stat().st_size / 1e6:>9.1f} "
+            for mode in args.modes.split(','):
+                output = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, str(ttml_path)],
+                    env=env, cwd=str(ROOT), capture_output=True, text=True, check=True
+                ).stdout
+                row += f"{int(output.split()[-1]) / 1024:>18.1f} "
+            print(row)
+            for path in Path(tmp).glob(f"{ttml_path.stem}*"):
+                path.unlink()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""批处理流水线回放基准测试
+
+先用 --record 访问 YouTube 并录制 yt-dlp 的全部网络请求，之后在无网络的机器上回放，
+按录制时的耗时（乘以 --latency-scale）返回响应，可重复地比较解析、缓存、并发等改动前后的耗时。
+每轮使用新的处理器和空的字幕目录，不命中内存缓存和磁盘缓存。
+
+用法:
+    python benchmarks/replay_batch.py --record --urls URL [URL ...]
+    python benchmarks/replay_batch.py --urls URL [URL ...] [--rounds 5] [--latency-scale 0] [--convert json]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', nargs='+', required=True)
+    parser.add_argument('--lang', default='en')
+    parser.add_argument('--convert', default=None, help='txt / json')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--record', action='store_true', help='访问网络并录制（只执行一轮）')
+    parser.add_argument('--archive', default=None, help='存档路径（默认 TRANSPORT_ARCHIVE）')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='回放延迟系数，0 表示不延迟')
+    args = parser.parse_args()
+
+    # 在导入服务模块之前设置，config 在导入时读取环境变量
+    os.environ.update(
+        TRANSPORT_MODE='record' if args.record else 'replay',
+        TRANSPORT_LATENCY_SCALE=str(args.latency_scale),
+        DISK_CACHE_TTL_MINUTES='0',
+        SEARCH_INDEX_ENABLED='false',
+        DISTRIBUTED_MODE='false',
+        WATCHLIST_ENABLED='false'
+    )
+    if args.archive:
+        os.environ['TRANSPORT_ARCHIVE'] = str(Path(args.archive).resolve())
+
+    from src.config import config
+    from src.deadline import Deadline
+    from src.subtitle import SubtitleProcessor
+    from src.transport import transport_archive
+
+    rounds = 1 if args.record else args.rounds
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(rounds):
+            config.SUBTITLE_DIR = Path(tmp) / f'subs{i}'
+            config.TEMP_DIR = Path(tmp) / f'temp{i}'
+            config.SUBTITLE_DIR.mkdir()
+            config.TEMP_DIR.mkdir()
+            transport_archive.reset()
+
+            processor = SubtitleProcessor()
+            started = time.perf_counter()
+            results = processor.process_batch(args.urls, args.lang, args.convert, Deadline(config.MAX_REQUEST_TIMEOUT))
+            elapsed = time.perf_counter() - started
+            timings.append(elapsed)
+            ok = sum(r.get('status') == 'success' for r in results)
+            print(f"round {i + 1}: {elapsed * 1000:.1f} ms, {ok}/{len(results)} success")
+
+    if args.record:
+        print(transport_archive.stats())
+    elif len(timings) > 1:
+        print(f"median {statistics.median(timings) * 1000:.1f} ms, "
+              f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 from flask import Flask, request, jsonify
 from .subtitle import SubtitleProcessor
 from .config import config
+from .deadline import request_deadline
+from .slicing import slice_params as parse_slice_params
+from .streaming import json_response, describe_content
+from .watchlist import watchlist, WatchlistScheduler
+from .profiler import profiler
 import logging
 import atexit
 import shutil
@@ -52,17 +57,35 @@ app = Flask(__name__)
 # 注册Blueprint
 app.register_blueprint(bp, url_prefix='/')
 
+# 采样分析：以接口作为调用栈标注（管理接口本身不计入）
+@app.before_request
+def before_request():
+    if profiler.active and request.endpoint != 'api.admin_profile':
+        rule = request.url_rule.rule if request.url_rule else request.path
+        profiler.begin_request(f"{request.method} {rule}")
+
 # 添加CORS支持
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE')
+    if profiler.active and request.endpoint != 'api.admin_profile':
+        # 流式响应在返回后才编码输出，在响应关闭时才算请求结束
+        response.call_on_close(profiler.end_request)
     return response
 
+# SIGUSR2: 开始/结束采样（只对收到信号的进程生效）
+profiler.install_signal_handler()
+
 # 创建字幕处理器实例
 subtitle_processor = SubtitleProcessor()
 
+# 启动观察列表预取调度器（多进程部署时只有一个进程实际执行预取）
+watchlist_scheduler = WatchlistScheduler(watchlist, subtitle_processor)
+if config.WATCHLIST_ENABLED:
+    watchlist_scheduler.start()
+
 def cleanup_temp_files():
     """清理临时文件"""
     try:
@@ -76,7 +99,8 @@ def health_check():
     """健康检查接口"""
     return jsonify({
         'status': 'healthy',
-        'message': 'Service is running'
+        'message': 'Service is running',
+        'cache': subtitle_processor.cache_stats()
     })
 
 @app.route('/batch_subs', methods=['POST'])
@@ -88,7 +112,10 @@ def batch_download():
         log_data = {
             'urls': data.get('urls'),
             'lang': data.get('lang'),
-            'convert': data.get('convert')
+            'convert': data.get('convert'),
+            'timeout': data.get('timeout'),
+            'start': data.get('start'),
+            'end': data.get('end')
         }
         logger.info(f"收到字幕下载请求: {log_data}")
         
@@ -110,23 +137,37 @@ def batch_download():
             
         lang = data.get('lang', 'en')
         convert_to = data.get('convert')
+        try:
+            deadline = request_deadline(data.get('timeout'))
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'timeout参数无效: {str(e)}'
+            }), 400
+        try:
+            slice_params = parse_slice_params(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'切片参数无效: {str(e)}'
+            }), 400
         
         logger.info(f"开始处理URLs: {urls}, 语言: {lang}, 转换格式: {convert_to}")
-        results = subtitle_processor.process_batch(urls, lang, convert_to)
+        results = subtitle_processor.process_batch(urls, lang, convert_to, deadline, slice_params)
         
         # 记录结果时排除内容数据
         log_results = []
         for result in results:
             log_result = result.copy()
-            if 'content' in log_result:
-                log_result['content'] = f"<{len(log_result['content'])} chars>"
-            if 'converted_content' in log_result:
-                log_result['converted_content'] = f"<{len(log_result['converted_content'])} chars>"
+            for key in ('content', 'converted_content'):
+                if key in log_result:
+                    log_result[key] = describe_content(log_result[key])
             log_results.append(log_result)
             
         logger.info(f"处理完成，结果: {log_results}")
         
-        return jsonify({
+        # 流式输出，字幕内容从磁盘分块写入响应
+        return json_response({
             'status': 'success',
             'results': results
         })
@@ -156,6 +197,7 @@ def server_error(e):
 def shutdown_handler():
     """优雅关闭处理"""
     try:
+        watchlist_scheduler.stop()
         # 等待当前任务完成
         if hasattr(app, 'executor'):
             app.executor.shutdown(wait=True)
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from typing import Dict, List, Optional
+from .config import config
+from .streaming import encode_lazy, decode_lazy
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    convert_to TEXT,
+    expires_at REAL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_batch ON tasks(batch_id);
+"""
+
+
+class TaskBroker:
+    """基于 SQLite 的任务队列，无需外部服务
+
+    Web 进程把批处理任务写入队列，一个或多个 worker 进程以租约方式领取任务，
+    并通过心跳续租；worker 崩溃后租约过期，任务会被重新领取。
+    默认使用 WAL 模式，所有进程必须在同一台主机上（WAL 的共享内存索引不能跨主机）；
+    shared_storage 为 True 时改用 DELETE 日志模式，依赖文件锁在共享存储的多台主机间互斥，
+    写操作均为单条语句或 BEGIN IMMEDIATE 事务。
+    """
+
+    def __init__(self, db_path: Path, lease_seconds: int = 60, max_attempts: int = 3,
+                 shared_storage: bool = False):
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.journal_mode = 'DELETE' if shared_storage else 'WAL'
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接，事务由调用方显式控制"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.db_path.parent.mkdir(exist_ok=True, parents=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, batch_id: str, items: List[Dict]) -> List[int]:
+        """提交任务，items 中每项包含 video_id、url、lang、convert_to、expires_at（请求截止时间）"""
+        conn = self._connect()
+        now = time.time()
+        task_ids = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for item in items:
+                cursor = conn.execute(
+                    'INSERT INTO tasks (batch_id, video_id, url, lang, convert_to, expires_at, '
+                    'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (batch_id, item['video_id'], item['url'], item['lang'],
+                     item.get('convert_to'), item.get('expires_at'), now, now)
+                )
+                task_ids.append(cursor.lastrowid)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return task_ids
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """领取一个待处理任务（或租约已过期的任务），没有任务时返回 None"""
+        conn = self._connect()
+        while True:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    "SELECT id, batch_id, video_id, url, lang, convert_to, expires_at, status, attempts FROM tasks "
+                    "WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+
+                task_id, batch_id, video_id, url, lang, convert_to, expires_at, status, attempts = row
+                if attempts >= self.max_attempts:
+                    # 多次领取后仍未完成（worker 反复崩溃），放弃该任务
+                    result = {
+                        'status': 'error',
+                        'url': url,
+                        'code': 'WORKER_LOST',
+                        'message': f'任务在 {attempts} 次尝试后仍未完成'
+                    }
+                    conn.execute(
+                        "UPDATE tasks SET status = 'failed', result = ?, lease_owner = NULL, "
+                        "updated_at = ? WHERE id = ?",
+                        (json.dumps(result, ensure_ascii=False), now, task_id)
+                    )
+                    conn.execute('COMMIT')
+                    logger.error(f"任务失败（超过最大尝试次数）: {url}")
+                    continue
+
+                if status == 'running':
+                    logger.info(f"重新领取租约过期的任务: {url}, 第 {attempts + 1} 次尝试")
+                conn.execute(
+                    "UPDATE tasks SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, now, task_id)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+            return {
+                'id': task_id,
+                'batch_id': batch_id,
+                'video_id': video_id,
+                'url': url,
+                'lang': lang,
+                'convert_to': convert_to,
+                'expires_at': expires_at,
+                'attempts': attempts + 1
+            }
+
+    def heartbeat(self, task_id: int, worker_id: str) -> bool:
+        """续租，租约已被其他 worker 接管时返回 False"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (now + self.lease_seconds, now, task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker_id: str, result: Dict) -> bool:
+        """提交任务结果，租约已失效时结果被丢弃并返回 False"""
+        cursor = self._connect().execute(
+            "UPDATE tasks SET status = 'done', result = ?, lease_owner = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (json.dumps(result, ensure_ascii=False, default=encode_lazy), time.time(), task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, task_id: int, worker_id: str):
+        """放弃任务，立即放回队列等待重试"""
+        self._connect().execute(
+            "UPDATE tasks SET status = 'pending', lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (time.time(), task_id, worker_id)
+        )
+
+    def collect(self, batch_id: str) -> Dict[int, Dict]:
+        """获取批次中已完成任务的结果: task_id -> result"""
+        rows = self._connect().execute(
+            "SELECT id, result FROM tasks WHERE batch_id = ? AND status IN ('done', 'failed')",
+            (batch_id,)
+        ).fetchall()
+        return {task_id: json.loads(result, object_hook=decode_lazy) for task_id, result in rows}
+
+    def wait(self, batch_id: str, task_ids: List[int], timeout: float,
+             poll_interval: float = 0.5) -> Dict[int, Dict]:
+        """等待批次完成或超时，返回已完成的结果"""
+        deadline = time.time() + timeout
+        while True:
+            results = self.collect(batch_id)
+            if len(results) >= len(task_ids) or time.time() >= deadline:
+                return results
+            time.sleep(poll_interval)
+
+    def purge(self, batch_id: str):
+        """删除批次的所有任务（包括尚未完成的）"""
+        self._connect().execute('DELETE FROM tasks WHERE batch_id = ?', (batch_id,))
+
+    def stats(self) -> Dict:
+        """队列统计信息"""
+        rows = self._connect().execute(
+            'SELECT status, COUNT(*) FROM tasks GROUP BY status'
+        ).fetchall()
+        return dict(rows)
+
+
+broker = TaskBroker(
+    config.BROKER_PATH,
+    lease_seconds=config.BROKER_LEASE_SECONDS,
+    max_attempts=config.BROKER_MAX_ATTEMPTS,
+    shared_storage=config.BROKER_SHARED_STORAGE
+)
+
+
+def _worker_loop(worker_id: str, stop_event):
+    """单个 worker 线程：循环领取并处理任务"""
+    # 延迟导入，避免与 subtitle 模块循环导入
+    from .subtitle import SubtitleProcessor
+    from .deadline import Deadline
+    processor = SubtitleProcessor()
+
+    while not stop_event.is_set():
+        try:
+            task = broker.claim(worker_id)
+        except sqlite3.Error as e:
+            logger.error(f"领取任务失败: {e}")
+            stop_event.wait(config.BROKER_POLL_INTERVAL)
+            continue
+
+        if task is None:
+            stop_event.wait(config.BROKER_POLL_INTERVAL)
+            continue
+
+        logger.info(f"[{worker_id}] 开始处理任务 {task['id']}: {task['url']}")
+
+        # 后台心跳线程，处理期间持续续租
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(broker.lease_seconds / 3):
+                if not broker.heartbeat(task['id'], worker_id):
+                    logger.error(f"[{worker_id}] 任务 {task['id']} 的租约已失效")
+                    return
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            # 沿用请求方的截止时间，已过期的任务会直接返回 TIMEOUT 结果
+            deadline = Deadline.at(task['expires_at']) if task['expires_at'] else None
+            result = processor.process_single(task['url'], task['lang'], task['convert_to'], deadline)
+            if not broker.complete(task['id'], worker_id, result):
+                logger.error(f"[{worker_id}] 任务 {task['id']} 的结果被丢弃（租约已失效）")
+        except Exception as e:
+            logger.error(f"[{worker_id}] 处理任务失败: {task['url']}, 错误: {e}")
+            broker.release(task['id'], worker_id)
+        finally:
+            done.set()
+            heartbeat_thread.join()
+
+
+def run_worker(threads: int = 4):
+    """worker 进程入口，每个进程运行多个处理线程"""
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format=config.LOG_FORMAT)
+    stop_event = threading.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    workers = [
+        threading.Thread(
+            target=_worker_loop,
+            args=(f"{prefix}:{i}:{uuid.uuid4().hex[:6]}", stop_event),
+            daemon=True
+        )
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"worker 进程已启动: {prefix}, 线程数: {threads}")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+def main(argv=None):
+    """命令行入口: python -m src.broker worker [-p 进程数] [-t 线程数]"""
+    parser = argparse.ArgumentParser(description='分布式字幕处理任务队列')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worker_parser = subparsers.add_parser('worker', help='启动 worker 进程')
+    worker_parser.add_argument('-p', '--processes', type=int, default=multiprocessing.cpu_count())
+    worker_parser.add_argument('-t', '--threads', type=int, default=4)
+    subparsers.add_parser('stats', help='查看队列状态')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format=config.LOG_FORMAT)
+    if args.command == 'stats':
+        print(broker.stats())
+        return 0
+
+    def spawn():
+        process = multiprocessing.Process(target=run_worker, args=(args.threads,))
+        process.start()
+        return process
+
+    processes = [spawn() for _ in range(args.processes)]
+    try:
+        # 监控 worker 进程，异常退出的进程自动重启（其未完成任务在租约过期后被重新领取）
+        while True:
+            time.sleep(5)
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.error(f"worker 进程 {process.pid} 已退出 (code={process.exitcode})，正在重启")
+                    processes[i] = spawn()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
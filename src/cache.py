@@ -0,0 +1,122 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from .streaming import FileContent
+
+
+def content_size(value: Any) -> int:
+    """估算缓存值占用的内存字节数（按内容计算）
+
+    字符串按 UTF-8 字节数计算，FileContent 的内容保留在磁盘上，不计入内存。
+    """
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(content_size(k) + content_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(content_size(v) for v in value)
+    if isinstance(value, FileContent):
+        return 0
+    # 数字、None 等标量
+    return 8
+
+
+class TTLCache:
+    """线程安全的过期缓存
+
+    所有条目的有效期相同，因此写入顺序即过期顺序：条目保存在按写入时间排列的 OrderedDict 中，
+    过期清理只需从头部弹出已过期的条目，均摊 O(1)，不再每次写入都扫描整个缓存。
+    超过 max_bytes（按内容字节数统计）时从最早写入的条目开始淘汰。
+    """
+
+    def __init__(self, ttl_seconds: float, max_bytes: int = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (过期时间, 字节数, 值)
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取未过期的值，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] <= self._clock():
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any):
+        """写入（覆盖已有条目并重新计算有效期），同时清理过期条目和超出容量的条目"""
+        size = content_size(value)
+        with self._lock:
+            now = self._clock()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (now + self.ttl, size, value)
+            self._bytes += size
+            self._expire(now)
+            if self.max_bytes:
+                # 至少保留刚写入的条目
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    self._remove(next(iter(self._entries)))
+                    self._stats['evicted'] += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            return entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def expire(self) -> int:
+        """清理所有已过期条目，返回清理数量"""
+        with self._lock:
+            return self._expire(self._clock())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                **self._stats
+            }
+
+    def _remove(self, key: Hashable):
+        expires_at, size, value = self._entries.pop(key)
+        self._bytes -= size
+
+    def _expire(self, now: float) -> int:
+        """从头部弹出已过期的条目（头部总是最早过期的条目）"""
+        removed = 0
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] > now:
+                break
+            self._remove(key)
+            removed += 1
+        self._stats['expired'] += removed
+        return removed
@@ -26,7 +26,61 @@ class Config:
         )
         self.CLEANUP_INTERVAL = int(os.getenv("CLEANUP_INTERVAL", 3600))
         self.FILE_RETENTION_HOURS = int(os.getenv("FILE_RETENTION_HOURS", 24))
-               
+
+        # 内存缓存内容总大小上限(MB)，0 表示不限制
+        self.CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", 64))
+
+        # 磁盘缓存（多进程共享）有效期，默认与内存缓存相同，0 表示禁用
+        self.DISK_CACHE_TTL_MINUTES = float(
+            os.getenv("DISK_CACHE_TTL_MINUTES", os.getenv("CACHE_TTL_MINUTES", 30))
+        )
+
+        # 超时配置（秒）：请求级截止时间及各阶段预算
+        self.REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 60))
+        self.MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", 300))
+        self.EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", 20))
+        self.DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", 15))
+        self.CONVERT_TIMEOUT = float(os.getenv("CONVERT_TIMEOUT", 10))
+        # yt-dlp 单次网络请求的 socket 超时，阶段预算内能容纳几次请求就重试几次
+        self.SOCKET_TIMEOUT = float(os.getenv("SOCKET_TIMEOUT", 10))
+
+        # 分布式模式配置（SQLite 任务队列，worker 通过 python -m src.broker worker 启动）
+        self.DISTRIBUTED_MODE = os.getenv("DISTRIBUTED_MODE", "false").lower() == "true"
+        self.BROKER_PATH = self.BASE_DIR / os.getenv("BROKER_PATH", "data/broker.db")
+        # 队列数据库位于多台主机共享的网络文件系统上时设为 true（WAL 模式只能在单机上使用）
+        self.BROKER_SHARED_STORAGE = os.getenv("BROKER_SHARED_STORAGE", "false").lower() == "true"
+        self.BROKER_LEASE_SECONDS = int(os.getenv("BROKER_LEASE_SECONDS", 60))
+        self.BROKER_MAX_ATTEMPTS = int(os.getenv("BROKER_MAX_ATTEMPTS", 3))
+        self.BROKER_POLL_INTERVAL = float(os.getenv("BROKER_POLL_INTERVAL", 0.5))
+        self.BROKER_RESULT_TIMEOUT = int(os.getenv("BROKER_RESULT_TIMEOUT", 600))
+
+        # 观察列表预取配置
+        self.WATCHLIST_ENABLED = os.getenv("WATCHLIST_ENABLED", "false").lower() == "true"
+        self.WATCHLIST_PATH = self.BASE_DIR / os.getenv("WATCHLIST_PATH", "data/watchlist.db")
+        self.WATCHLIST_DEFAULT_INTERVAL_MINUTES = float(os.getenv("WATCHLIST_DEFAULT_INTERVAL_MINUTES", 60))
+        self.WATCHLIST_MIN_INTERVAL_MINUTES = float(os.getenv("WATCHLIST_MIN_INTERVAL_MINUTES", 5))
+        self.WATCHLIST_TICK_SECONDS = float(os.getenv("WATCHLIST_TICK_SECONDS", 60))
+        self.WATCHLIST_RATE_PER_MINUTE = float(os.getenv("WATCHLIST_RATE_PER_MINUTE", 6))
+        self.WATCHLIST_OFFPEAK_HOURS = os.getenv("WATCHLIST_OFFPEAK_HOURS", "")
+        self.WATCHLIST_MAX_VIDEOS = int(os.getenv("WATCHLIST_MAX_VIDEOS", 30))
+
+        # yt-dlp 网络传输模式: live（直接访问）/ record（访问并录制）/ replay（离线回放录制）
+        self.TRANSPORT_MODE = os.getenv("TRANSPORT_MODE", "live").lower()
+        self.TRANSPORT_ARCHIVE = self.BASE_DIR / os.getenv("TRANSPORT_ARCHIVE", "data/transport.db")
+        # 回放延迟 = 录制耗时 × 该系数，0 表示不延迟
+        self.TRANSPORT_LATENCY_SCALE = float(os.getenv("TRANSPORT_LATENCY_SCALE", 1.0))
+
+        # 全文索引配置
+        self.SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+        self.SEARCH_INDEX_PATH = self.BASE_DIR / os.getenv("SEARCH_INDEX_PATH", "data/search_index.db")
+
+        # 性能采样配置（管理接口需要 ADMIN_TOKEN，未设置时禁用）
+        self.ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+        self.PROFILE_DIR = self.BASE_DIR / os.getenv("PROFILE_DIR", "logs/profiles")
+        self.PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+        self.PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", 30))
+        self.PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 300))
+
         # 日志配置
         self.LOG_DIR = self.BASE_DIR / 'logs'
         self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
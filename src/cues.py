@@ -0,0 +1,286 @@
+import io
+import re
+import json
+import bisect
+import logging
+import threading
+from array import array
+from pathlib import Path
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+from xml.sax.saxutils import escape
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# TTML 时间表达式：时钟格式 hh:mm:ss(.fff) / hh:mm:ss:ff，或偏移格式 12.3s / 500ms / 100t 等
+CLOCK_TIME_REGEX = re.compile(r'^(\d+):(\d{2}):(\d{2})(?:\.(\d+)|:(\d+))?$')
+OFFSET_TIME_REGEX = re.compile(r'^(\d+(?:\.\d+)?)(h|m|s|ms|f|t)$')
+
+TTP_NAMESPACE = '{http://www.w3.org/ns/ttml#parameter}'
+
+
+class Cue(NamedTuple):
+    """单条字幕（begin / end 为 TTML 中的原始时间表达式）"""
+    index: int
+    start_ms: int
+    end_ms: int
+    text: str
+    begin: str = ''
+    end: str = ''
+
+
+def parse_time(value: str, tick_rate: int = 1, frame_rate: int = 30) -> int:
+    """将 TTML 时间表达式转换为毫秒，无法解析时返回 0"""
+    value = (value or '').strip()
+    if not value:
+        return 0
+
+    match = CLOCK_TIME_REGEX.match(value)
+    if match:
+        hours, minutes, seconds, fraction, frames = match.groups()
+        ms = (int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1000
+        if fraction:
+            ms += int(round(float(f"0.{fraction}") * 1000))
+        elif frames:
+            ms += int(int(frames) * 1000 / frame_rate)
+        return ms
+
+    match = OFFSET_TIME_REGEX.match(value)
+    if match:
+        number, unit = float(match.group(1)), match.group(2)
+        factor = {
+            'h': 3600 * 1000,
+            'm': 60 * 1000,
+            's': 1000,
+            'ms': 1,
+            'f': 1000 / frame_rate,
+            't': 1000 / tick_rate
+        }[unit]
+        return int(round(number * factor))
+
+    logger.debug(f"无法解析的时间表达式: {value}")
+    return 0
+
+
+def iter_cues(source) -> Iterator[Cue]:
+    """流式解析 TTML（文件路径或二进制文件对象），逐条产出非空字幕
+
+    使用 iterparse 并及时清理已处理的元素，内存占用不随字幕长度增长。
+    index 与 JSON 转换结果一致，从 1 开始（包括空字幕在内计数）。
+    """
+    tick_rate, frame_rate = 1, 30
+    index = 0
+    parents = []
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if not parents:
+                tick_rate = int(elem.get(f'{TTP_NAMESPACE}tickRate', 1) or 1)
+                frame_rate = int(elem.get(f'{TTP_NAMESPACE}frameRate', 30) or 30)
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        if elem.tag.rsplit('}', 1)[-1] != 'p':
+            continue
+
+        index += 1
+        text = ''.join(elem.itertext()).strip()
+        if text:
+            begin, end = elem.get('begin', ''), elem.get('end', '')
+            yield Cue(
+                index=index,
+                start_ms=parse_time(begin, tick_rate, frame_rate),
+                end_ms=parse_time(end, tick_rate, frame_rate),
+                text=text,
+                begin=begin,
+                end=end
+            )
+        # 已处理的 p 元素及其之前的兄弟元素都不再需要，从父元素中移除以释放内存
+        if parents:
+            del parents[-1][:]
+
+
+def parse_cues(ttml_content: str) -> List[Cue]:
+    """解析 TTML 内容，返回所有非空字幕"""
+    return list(iter_cues(io.BytesIO(ttml_content.encode('utf-8'))))
+
+
+def parse_cues_file(ttml_path: Path) -> List[Cue]:
+    """解析 TTML 文件"""
+    return list(iter_cues(str(ttml_path)))
+
+
+def parse_subtitle_filename(path: Path) -> Optional[tuple]:
+    """从字幕文件名中解析 (video_id, lang)，文件名格式: {video_id}.{lang}[.auto].ttml"""
+    parts = Path(path).name.split('.')
+    if len(parts) < 3 or parts[-1] != 'ttml':
+        return None
+    return parts[0], parts[1]
+
+
+def format_time(ms: int) -> str:
+    """毫秒转换为 TTML 时钟格式 hh:mm:ss.mmm"""
+    seconds, ms = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{ms:03d}"
+
+
+class CueTrack:
+    """字幕轨道的紧凑时间索引，支持二分查找切片
+
+    只在 array 中保存每条字幕的开始时间、结束时间前缀最大值和序号（每条 20 字节），不保存字幕文本；
+    切片时先用索引确定范围，再流式解析 TTML 取出范围内的字幕，内存占用只与切片大小有关。
+    source 为 TTML 文件路径或 TTML 内容（bytes）。
+    """
+
+    def __init__(self, source):
+        self.source = source if isinstance(source, bytes) else str(source)
+        # 按开始时间排序（开始时间相同时按序号）
+        self.starts = array('q')
+        # 结束时间的前缀最大值（单调不减），用于二分查找第一个可能与窗口重叠的字幕
+        self.max_ends = array('q')
+        self.indexes = array('i')
+        # 文件中的字幕顺序与开始时间顺序一致（通常如此），切片时可以按文件顺序直接输出
+        self.in_order = True
+
+        ends = array('q')
+        for cue in iter_cues(self._open()):
+            if self.starts and cue.start_ms < self.starts[-1]:
+                self.in_order = False
+            self.starts.append(cue.start_ms)
+            ends.append(cue.end_ms)
+            self.indexes.append(cue.index)
+        if not self.in_order:
+            # 稳定排序，开始时间相同时保持序号顺序
+            order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+            self.starts = array('q', (self.starts[i] for i in order))
+            self.indexes = array('i', (self.indexes[i] for i in order))
+            ends = array('q', (ends[i] for i in order))
+        max_end = 0
+        for end_ms in ends:
+            max_end = max(max_end, end_ms)
+            self.max_ends.append(max_end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _open(self):
+        return io.BytesIO(self.source) if isinstance(self.source, bytes) else self.source
+
+    def slice_time(self, start_ms: int = 0, end_ms: Optional[int] = None) -> List[Cue]:
+        """返回与时间窗口 [start_ms, end_ms) 有重叠的字幕（按开始时间排序）"""
+        lo = bisect.bisect_right(self.max_ends, start_ms)
+        hi = len(self.starts) if end_ms is None else bisect.bisect_left(self.starts, end_ms)
+        if lo >= hi:
+            return []
+
+        def overlaps(c: Cue) -> bool:
+            return c.end_ms > start_ms or c.start_ms >= start_ms
+
+        if self.in_order:
+            return [c for c in self._scan(self.indexes[lo], self.indexes[hi - 1]) if overlaps(c)]
+        wanted = set(self.indexes[lo:hi])
+        cues = [c for c in self._scan(min(wanted), max(wanted)) if c.index in wanted and overlaps(c)]
+        return sorted(cues, key=lambda c: (c.start_ms, c.index))
+
+    def slice_index(self, start_index: int = 1, end_index: Optional[int] = None) -> List[Cue]:
+        """返回字幕序号在 [start_index, end_index] 范围内的字幕"""
+        return list(self._scan(start_index, end_index))
+
+    def _scan(self, first_index: int, last_index: Optional[int]) -> Iterator[Cue]:
+        """流式解析 TTML，产出序号在 [first_index, last_index] 内的字幕，超出范围后停止解析"""
+        for cue in iter_cues(self._open()):
+            if last_index is not None and cue.index > last_index:
+                break
+            if cue.index >= first_index:
+                yield cue
+
+
+# 轨道索引缓存的字幕总条数上限（每条约 20 字节）
+TRACK_CACHE_MAX_CUES = 1000000
+
+_track_cache: 'OrderedDict[tuple, CueTrack]' = OrderedDict()
+_track_cache_cues = 0
+_track_cache_lock = threading.Lock()
+
+
+def load_track(ttml_path: Path) -> CueTrack:
+    """加载字幕轨道索引（按文件路径、修改时间和大小缓存，按字幕总条数淘汰最久未使用的轨道）"""
+    global _track_cache_cues
+    stat = Path(ttml_path).stat()
+    key = (str(ttml_path), stat.st_mtime_ns, stat.st_size)
+    with _track_cache_lock:
+        track = _track_cache.get(key)
+        if track is not None:
+            _track_cache.move_to_end(key)
+            return track
+
+    track = CueTrack(ttml_path)
+    with _track_cache_lock:
+        if key not in _track_cache:
+            _track_cache[key] = track
+            _track_cache_cues += len(track)
+            # 至少保留刚加载的轨道
+            while _track_cache_cues > TRACK_CACHE_MAX_CUES and len(_track_cache) > 1:
+                _, evicted = _track_cache.popitem(last=False)
+                _track_cache_cues -= len(evicted)
+    return track
+
+
+def render_txt(cues: List[Cue]) -> str:
+    """渲染为纯文本，与 TXT 转换结果格式一致"""
+    return ''.join(iter_txt(cues))
+
+
+def cue_to_dict(cue: Cue) -> dict:
+    """JSON 格式中的单条字幕（start / end 保留 TTML 中的原始时间表达式）"""
+    return {
+        'index': cue.index,
+        'start': cue.begin,
+        'end': cue.end,
+        'text': cue.text
+    }
+
+
+def iter_json(cues: Iterable[Cue]) -> Iterator[str]:
+    """逐条编码为紧凑 JSON 数组，可直接写入文件或响应流"""
+    yield '['
+    for i, cue in enumerate(cues):
+        if i:
+            yield ','
+        yield json.dumps(cue_to_dict(cue), ensure_ascii=False, separators=(',', ':'))
+    yield ']'
+
+
+def iter_txt(cues: Iterable[Cue]) -> Iterator[str]:
+    """逐条输出纯文本，每条字幕一行（末尾无换行）"""
+    for i, cue in enumerate(cues):
+        yield ('\n' if i else '') + cue.text
+
+
+def render_json(cues: List[Cue]) -> str:
+    """渲染为 JSON，与 JSON 转换结果格式一致"""
+    return ''.join(iter_json(cues))
+
+
+def render_ttml(cues: List[Cue]) -> str:
+    """渲染为最简 TTML 文档"""
+    body = '\n'.join(
+        f'<p begin="{format_time(c.start_ms)}" end="{format_time(c.end_ms)}">{escape(c.text)}</p>'
+        for c in cues
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8" ?>\n'
+        '<tt xmlns="http://www.w3.org/ns/ttml"><body><div>\n'
+        f'{body}\n'
+        '</div></body></tt>'
+    )
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'json': render_json,
+    'ttml': render_ttml
+}
@@ -0,0 +1,71 @@
+import time
+from typing import Optional
+from .config import config
+
+
+class DeadlineExceeded(TimeoutError):
+    """请求时间预算已用完"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"处理超时（阶段: {stage}）")
+        self.stage = stage
+
+
+class Deadline:
+    """请求级截止时间，从接口层一路传递到 yt-dlp 和格式转换
+
+    使用绝对时间戳（time.time()），可以跨进程传递给分布式 worker。
+    """
+
+    def __init__(self, timeout: float, expires_at: Optional[float] = None):
+        self.expires_at = expires_at if expires_at is not None else time.time() + timeout
+
+    @classmethod
+    def at(cls, expires_at: float) -> 'Deadline':
+        """根据绝对时间戳创建"""
+        return cls(0, expires_at=expires_at)
+
+    def remaining(self) -> float:
+        """剩余时间（秒），已过期时返回 0"""
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def stage(self, budget: float) -> 'Deadline':
+        """为某个阶段创建子截止时间：取阶段预算和剩余时间中较小的一个"""
+        return Deadline.at(min(self.expires_at, time.time() + budget))
+
+    def check(self, stage: str):
+        """已过期时抛出 DeadlineExceeded"""
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+
+def request_deadline(timeout=None) -> Deadline:
+    """根据请求参数创建截止时间，未指定时使用 REQUEST_TIMEOUT，最大不超过 MAX_REQUEST_TIMEOUT
+    Raises:
+        ValueError: timeout 不是正数
+    """
+    if timeout is None:
+        timeout = config.REQUEST_TIMEOUT
+    timeout = float(timeout)
+    if timeout <= 0:
+        raise ValueError(f"timeout 必须大于 0: {timeout}")
+    return Deadline(min(timeout, config.MAX_REQUEST_TIMEOUT))
+
+
+def timeout_result(url: str, stage: str) -> dict:
+    """生成超时结果"""
+    return {
+        'status': 'error',
+        'url': url,
+        'code': 'TIMEOUT',
+        'message': f'处理超时（阶段: {stage}）'
+    }
+
+
+def stop_at_deadline(retry_state) -> bool:
+    """tenacity 停止条件：被重试函数的 deadline 参数过期后不再重试"""
+    deadline = retry_state.kwargs.get('deadline')
+    return deadline is not None and deadline.expired()
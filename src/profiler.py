@@ -0,0 +1,297 @@
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+from pathlib import Path
+from collections import Counter
+from functools import wraps
+from typing import Dict, Optional
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+
+class _NoopStage:
+    """未启用采样时使用的空上下文，开销只有一次属性判断"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    """在当前线程的阶段栈上标注处理阶段"""
+
+    __slots__ = ('stack', 'name')
+
+    def __init__(self, stack: list, name: str):
+        self.stack = stack
+        self.name = name
+
+    def __enter__(self):
+        self.stack.append(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        # 采样期间进入的阶段，即使采样已结束也要出栈
+        if self.stack and self.stack[-1] == self.name:
+            self.stack.pop()
+        return False
+
+
+class SamplingProfiler:
+    """按需启用的采样分析器
+
+    启用后由后台线程定期读取各线程的调用栈（sys._current_frames），
+    以接口和处理阶段（extract / convert / cache / encode ...）作为栈底标注，
+    输出火焰图工具（flamegraph.pl、speedscope 等）可直接读取的 folded 格式。
+    未启用时 stage() 直接返回空上下文，可以常驻在热点路径中。
+    只对收到请求（或信号）的进程生效。
+    """
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self.active = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        # 线程ID -> 阶段栈（栈底为接口标注）
+        self._stacks: Dict[int, list] = {}
+        self._labels = {}
+        self._samples = Counter()
+        self._session = None
+        self.last_profile = None
+
+    # ---- 标注 ----
+
+    def stage(self, name: str):
+        """标注处理阶段: with profiler.stage('convert'): ..."""
+        if not self.active:
+            return _NOOP
+        return _Stage(self._stacks.setdefault(threading.get_ident(), []), f"[{name}]")
+
+    def begin_request(self, label: str):
+        """请求开始时以接口作为当前线程的栈底标注"""
+        if self.active:
+            self._stacks[threading.get_ident()] = [f"[{label}]"]
+
+    def end_request(self):
+        """请求（包括流式响应）结束：清除标注并计数，达到请求数上限时结束采样"""
+        self._stacks.pop(threading.get_ident(), None)
+        with self._lock:
+            session = self._session
+            if not self.active or session is None:
+                return
+            session['requests'] += 1
+            reached = session['max_requests'] and session['requests'] >= session['max_requests']
+        if reached:
+            self.stop()
+
+    def bind(self, fn):
+        """包装提交到线程池的函数，使工作线程继承提交时的接口和阶段标注"""
+        if not self.active:
+            return fn
+        inherited = list(self._stacks.get(threading.get_ident(), ()))
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            ident = threading.get_ident()
+            previous = self._stacks.get(ident)
+            self._stacks[ident] = list(inherited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if previous is None:
+                    self._stacks.pop(ident, None)
+                else:
+                    self._stacks[ident] = previous
+        return wrapper
+
+    # ---- 采样控制 ----
+
+    def start(self, seconds: Optional[float] = None, requests: Optional[int] = None,
+              interval_ms: Optional[float] = None, all_threads: bool = False) -> Dict:
+        """开始采样，持续 seconds 秒或直到完成 requests 个请求（都不超过 PROFILE_MAX_SECONDS）
+        Raises:
+            ValueError: 参数无效
+            RuntimeError: 已有采样在进行
+        """
+        if requests is not None and int(requests) <= 0:
+            raise ValueError("requests 必须大于 0")
+        if seconds is not None and float(seconds) <= 0:
+            raise ValueError("seconds 必须大于 0")
+        interval_ms = float(interval_ms or config.PROFILE_INTERVAL_MS)
+        if interval_ms < 1:
+            raise ValueError("interval_ms 不能小于 1")
+        if seconds is None:
+            seconds = config.PROFILE_MAX_SECONDS if requests else config.PROFILE_DEFAULT_SECONDS
+        seconds = min(float(seconds), config.PROFILE_MAX_SECONDS)
+
+        with self._lock:
+            if self.active:
+                raise RuntimeError("采样正在进行中")
+            self._samples = Counter()
+            self._stacks.clear()
+            self._stop_event.clear()
+            self._session = {
+                'started_at': time.time(),
+                'seconds': seconds,
+                'max_requests': int(requests) if requests else None,
+                'interval_ms': interval_ms,
+                'all_threads': bool(all_threads),
+                'requests': 0
+            }
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+            self._thread.start()
+        logger.info(f"开始采样分析: {self.status()}")
+        return self.status()
+
+    def stop(self):
+        """提前结束采样（不等待，结果由采样线程写出）"""
+        self._stop_event.set()
+
+    def status(self) -> Dict:
+        session = self._session
+        if not self.active or session is None:
+            return {'active': False}
+        return {
+            'active': True,
+            'pid': os.getpid(),
+            'elapsed': round(time.time() - session['started_at'], 2),
+            'seconds': session['seconds'],
+            'requests': session['requests'],
+            'max_requests': session['max_requests'],
+            'interval_ms': session['interval_ms'],
+            'samples': sum(self._samples.values())
+        }
+
+    def _run(self):
+        session = self._session
+        interval = session['interval_ms'] / 1000
+        ends_at = session['started_at'] + session['seconds']
+        own_ident = threading.get_ident()
+        names = {}
+        try:
+            while not self._stop_event.wait(interval) and time.time() < ends_at:
+                frames = sys._current_frames()
+                if session['all_threads'] and len(names) != threading.active_count():
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident == own_ident:
+                        continue
+                    annotations = self._stacks.get(ident)
+                    if not annotations:
+                        if not session['all_threads']:
+                            continue
+                        annotations = [f"[thread {names.get(ident, ident)}]"]
+                    self._samples[';'.join(annotations + self._walk(frame))] += 1
+                del frames
+        except Exception as e:
+            logger.error(f"采样线程异常: {e}")
+        finally:
+            self._finish(session)
+
+    def _walk(self, frame) -> list:
+        """调用栈从外到内的函数标签"""
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = self._label(code)
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return labels
+
+    @staticmethod
+    def _label(code) -> str:
+        filename = code.co_filename
+        base = str(config.BASE_DIR)
+        if filename.startswith(base):
+            filename = os.path.relpath(filename, base)
+        elif 'site-packages' in filename:
+            filename = filename.split('site-packages' + os.sep, 1)[-1]
+        else:
+            filename = os.path.basename(filename)
+        # folded 格式中 ';' 是分隔符，空格后是计数
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+    def _finish(self, session: Dict):
+        """采样结束：写出 folded 文件并汇总各接口、各阶段的样本数"""
+        with self._lock:
+            self.active = False
+            self._stacks.clear()
+            samples, self._samples = self._samples, Counter()
+            self._labels.clear()
+
+        by_stage = Counter()
+        for stack, count in samples.items():
+            annotations = [part for part in stack.split(';') if part.startswith('[')]
+            for name in annotations:
+                by_stage[name[1:-1]] += count
+
+        profile = {
+            'pid': os.getpid(),
+            'started_at': session['started_at'],
+            'duration': round(time.time() - session['started_at'], 2),
+            'requests': session['requests'],
+            'interval_ms': session['interval_ms'],
+            'samples': sum(samples.values()),
+            'stages': dict(by_stage.most_common()),
+            'folded': '\n'.join(f"{stack} {count}" for stack, count in sorted(samples.items())),
+            'path': None
+        }
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            path = self.output_dir / (
+                f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(session['started_at']))}"
+                f"-{os.getpid()}.folded"
+            )
+            path.write_text(profile['folded'] + '\n', encoding='utf-8')
+            profile['path'] = str(path)
+        except OSError as e:
+            logger.error(f"写入采样结果失败: {e}")
+        self.last_profile = profile
+        logger.info(
+            f"采样分析结束: {profile['samples']} 个样本, {profile['requests']} 个请求, "
+            f"耗时 {profile['duration']}s, 结果: {profile['path']}"
+        )
+
+    # ---- 信号 ----
+
+    def install_signal_handler(self, signum: int = getattr(signal, 'SIGUSR2', None)):
+        """注册信号处理：收到信号时开始采样（PROFILE_DEFAULT_SECONDS 秒），采样中再次收到则提前结束"""
+        if signum is None:
+            return
+        try:
+            signal.signal(signum, self._on_signal)
+        except ValueError:
+            # 只能在主线程注册信号处理
+            logger.debug("非主线程，跳过注册采样信号处理")
+
+    def _on_signal(self, signum, frame):
+        # 信号处理在主线程中执行，可能打断正持有 self._lock 的代码（end_request 等），
+        # 这里不能加锁或写日志，交给辅助线程处理
+        threading.Thread(target=self._toggle, name='profiler-signal', daemon=True).start()
+
+    def _toggle(self):
+        if self.active:
+            self.stop()
+            return
+        try:
+            self.start()
+        except RuntimeError:
+            pass
+
+
+profiler = SamplingProfiler(config.PROFILE_DIR)
+stage = profiler.stage
@@ -1,9 +1,14 @@
 import logging
 from typing import Dict, Optional
-import yt_dlp
 from pathlib import Path
-import xml.etree.ElementTree as ET
 from .config import config
+from .search_index import search_index
+from .deadline import Deadline, DeadlineExceeded
+from .ydl import extract_subtitles
+from .cues import iter_cues, iter_txt, load_track, render_txt
+from .slicing import build_spec, slice_track
+from .streaming import FileContent, write_stream
+from .profiler import stage
 
 logger = logging.getLogger(__name__)
 
@@ -24,11 +29,15 @@ class QuickSubtitleProcessor:
             'quiet': True
         }
 
-    def quick_process(self, url: str, lang: str = 'en') -> Dict:
+    def quick_process(self, url: str, lang: str = 'en',
+                      deadline: Optional[Deadline] = None,
+                      slice_params: Optional[Dict] = None) -> Dict:
         """快速处理单个URL的字幕并返回文本内容
         Args:
             url: YouTube URL
             lang: 字幕语言代码
+            deadline: 请求截止时间
+            slice_params: 切片参数，只返回指定时间窗口（或字幕序号范围）内的文本
         Returns:
             Dict: {
                 'status': 'success' | 'error',
@@ -47,37 +56,40 @@ class QuickSubtitleProcessor:
                 'subtitleslangs': [lang]
             })
             
-            with yt_dlp.YoutubeDL(normal_opts) as ydl:
-                try:
-                    logger.info(f"尝试下载普通字幕: {url}")
-                    info = ydl.extract_info(url, download=True)
-                    video_id = info['id']
-                    title = info.get('title', '')
-                    # 获取最高质量的缩略图
-                    thumbnails = info.get('thumbnails', [])
-                    thumbnail = thumbnails[-1]['url'] if thumbnails else info.get('thumbnail', '')
-                    
-                    # 检查普通字幕文件
-                    possible_paths = [
-                        config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",
-                        config.SUBTITLE_DIR / f"{video_id}.en.ttml"
-                    ]
-                    
-                    for sub_path in possible_paths:
-                        if sub_path.exists():
-                            logger.info(f"找到普通字幕: {sub_path}")
-                            text_content = self._extract_text(sub_path)
-                            return {
-                                'status': 'success',
-                                'text': text_content,
-                                'thumbnail': thumbnail,
-                                'title': title,
-                                'type': 'normal'
-                            }
-                            
-                except Exception as e:
-                    logger.info(f"未找到普通字幕，尝试自动生成字幕: {str(e)}")
-            
+            try:
+                logger.info(f"尝试下载普通字幕: {url}")
+                info = extract_subtitles(normal_opts, url, deadline)
+                video_id = info['id']
+                title = info.get('title', '')
+                # 获取最高质量的缩略图
+                thumbnails = info.get('thumbnails', [])
+                thumbnail = thumbnails[-1]['url'] if thumbnails else info.get('thumbnail', '')
+                
+                # 检查普通字幕文件
+                possible_paths = [
+                    config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",
+                    config.SUBTITLE_DIR / f"{video_id}.en.ttml"
+                ]
+                
+                for sub_path in possible_paths:
+                    if sub_path.exists():
+                        logger.info(f"找到普通字幕: {sub_path}")
+                        text_content = self._extract_text(sub_path, url, slice_params, deadline)
+                        if config.SEARCH_INDEX_ENABLED:
+                            search_index.enqueue(sub_path, 'normal')
+                        return {
+                            'status': 'success',
+                            'text': text_content,
+                            'thumbnail': thumbnail,
+                            'title': title,
+                            'type': 'normal'
+                        }
+                        
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.info(f"未找到普通字幕，尝试自动生成字幕: {str(e)}")
+        
             # 2. 如果没有普通字幕，尝试下载自动生成的字幕
             auto_opts = self.ydl_opts.copy()
             auto_opts.update({
@@ -86,49 +98,59 @@ class QuickSubtitleProcessor:
                 'subtitleslangs': [lang]
             })
             
-            with yt_dlp.YoutubeDL(auto_opts) as ydl:
-                try:
-                    logger.info(f"尝试下载自动生成字幕: {url}")
-                    info = ydl.extract_info(url, download=True)
-                    video_id = info['id']
-                    title = info.get('title', '')
-                    # 获取最高质量的缩略图
-                    thumbnails = info.get('thumbnails', [])
-                    thumbnail = thumbnails[-1]['url'] if thumbnails else info.get('thumbnail', '')
-                    
-                    # 检查自动生成的字幕文件
-                    possible_auto_paths = [
-                        config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",
-                        config.SUBTITLE_DIR / f"{video_id}.en.ttml",
-                        config.SUBTITLE_DIR / f"{video_id}.{lang}.auto.ttml"
-                    ]
-                    
-                    for auto_sub_path in possible_auto_paths:
-                        if auto_sub_path.exists():
-                            logger.info(f"找到自动生成字幕: {auto_sub_path}")
-                            text_content = self._extract_text(auto_sub_path)
-                            return {
-                                'status': 'success',
-                                'text': text_content,
-                                'thumbnail': thumbnail,
-                                'title': title,
-                                'type': 'auto'
-                            }
-                    
-                    return {
-                        'status': 'error',
-                        'error': '未找到任何字幕文件',
-                        'title': title,
-                        'thumbnail': thumbnail
-                    }
-                    
-                except Exception as e:
-                    logger.error(f"字幕下载失败: {str(e)}")
-                    return {
-                        'status': 'error',
-                        'error': str(e)
-                    }
-                    
+            try:
+                logger.info(f"尝试下载自动生成字幕: {url}")
+                info = extract_subtitles(auto_opts, url, deadline)
+                video_id = info['id']
+                title = info.get('title', '')
+                # 获取最高质量的缩略图
+                thumbnails = info.get('thumbnails', [])
+                thumbnail = thumbnails[-1]['url'] if thumbnails else info.get('thumbnail', '')
+                
+                # 检查自动生成的字幕文件
+                possible_auto_paths = [
+                    config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",
+                    config.SUBTITLE_DIR / f"{video_id}.en.ttml",
+                    config.SUBTITLE_DIR / f"{video_id}.{lang}.auto.ttml"
+                ]
+                
+                for auto_sub_path in possible_auto_paths:
+                    if auto_sub_path.exists():
+                        logger.info(f"找到自动生成字幕: {auto_sub_path}")
+                        text_content = self._extract_text(auto_sub_path, url, slice_params, deadline)
+                        if config.SEARCH_INDEX_ENABLED:
+                            search_index.enqueue(auto_sub_path, 'auto')
+                        return {
+                            'status': 'success',
+                            'text': text_content,
+                            'thumbnail': thumbnail,
+                            'title': title,
+                            'type': 'auto'
+                        }
+                
+                return {
+                    'status': 'error',
+                    'error': '未找到任何字幕文件',
+                    'title': title,
+                    'thumbnail': thumbnail
+                }
+                
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"字幕下载失败: {str(e)}")
+                return {
+                    'status': 'error',
+                    'error': str(e)
+                }
+                
+        except DeadlineExceeded as e:
+            logger.error(f"快速处理超时: {url}, 阶段: {e.stage}")
+            return {
+                'status': 'error',
+                'code': 'TIMEOUT',
+                'error': str(e)
+            }
         except Exception as e:
             logger.error(f"快速处理失败: {str(e)}")
             return {
@@ -136,27 +158,36 @@ class QuickSubtitleProcessor:
                 'error': str(e)
             }
 
-    def _extract_text(self, ttml_path: Path) -> str:
-        """从TTML文件提取纯文本内容"""
-        try:
-            # 读取TTML文件
-            with open(ttml_path, 'r', encoding='utf-8') as f:
-                ttml_content = f.read()
-
-            # 解析XML
-            root = ET.fromstring(ttml_content)
-            # 查找所有文本元素
-            text_elements = root.findall(".//{*}p")
+    def _iter_cues(self, ttml_path: Path, deadline: Optional[Deadline] = None):
+        """流式读取字幕，定期检查转换阶段的截止时间"""
+        for i, cue in enumerate(iter_cues(str(ttml_path))):
+            if deadline and i % 500 == 0:
+                deadline.check('convert')
+            yield cue
 
-            # 提取并合并文本
-            lines = []
-            for elem in text_elements:
-                text = ''.join(elem.itertext()).strip()
-                if text:
-                    lines.append(text)
+    def _extract_text(self, ttml_path: Path, url: str = '',
+                      slice_params: Optional[Dict] = None,
+                      deadline: Optional[Deadline] = None):
+        """从TTML文件提取纯文本内容，指定切片参数时只提取范围内的字幕
+        未切片时流式转换为临时文本文件（受 CONVERT_TIMEOUT 限制），返回 FileContent，
+        内存占用与字幕长度无关；解析错误在返回响应前抛出
+        Raises:
+            DeadlineExceeded: 转换超时
+            RuntimeError: 提取失败
+        """
+        try:
+            if slice_params:
+                with stage('slice'):
+                    track = load_track(ttml_path)
+                    return render_txt(slice_track(track, build_spec(slice_params, url)))
 
-            return '\n'.join(lines)
+            convert_deadline = deadline.stage(config.CONVERT_TIMEOUT) if deadline else None
+            output_path = config.TEMP_DIR / f"{ttml_path.stem}.txt"
+            with stage('convert'):
+                return FileContent(write_stream(output_path, iter_txt(self._iter_cues(ttml_path, convert_deadline))))
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"文本提取失败: {e}")
             raise RuntimeError(f"文本提取失败: {str(e)}") 
\ No newline at end of file
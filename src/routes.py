@@ -1,12 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from .subtitle import SubtitleProcessor
 from .quick_subtitle import QuickSubtitleProcessor
+from .search_index import search_index
+from .deadline import request_deadline
+from .slicing import slice_params as parse_slice_params
+from .streaming import json_response
+from .watchlist import watchlist
+from .profiler import profiler
+from .config import config
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import hmac
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 bp = Blueprint('api', __name__)
 subtitle_processor = SubtitleProcessor()
 quick_processor = QuickSubtitleProcessor()
+# 快速接口在独立线程中执行，以便在截止时间到达时立即返回
+quick_executor = ThreadPoolExecutor(max_workers=config.MAX_CONCURRENT_DOWNLOADS)
 
 @bp.route('/quick', methods=['GET', 'POST'])
 def quick_subtitle():
@@ -19,7 +31,10 @@ def quick_subtitle():
                 'message': '这是字幕快速获取API，请使用POST方法，参数示例：',
                 'example': {
                     'url': 'https://www.youtube.com/watch?v=xxxxx',
-                    'lang': 'en'
+                    'lang': 'en',
+                    'timeout': 60,
+                    'start': 3600,
+                    'end': 3900
                 },
                 'response_format': {
                     'status': 'success/error',
@@ -40,15 +55,201 @@ def quick_subtitle():
 
         url = data['url']
         lang = data.get('lang', 'en')
+        try:
+            deadline = request_deadline(data.get('timeout'))
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'timeout参数无效: {str(e)}'
+            }), 400
+        try:
+            slice_params = parse_slice_params(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'切片参数无效: {str(e)}'
+            }), 400
         
         logger.info(f"收到快速字幕请求: {data}")
         
-        result = quick_processor.quick_process(url, lang)
-        return jsonify(result)
+        future = quick_executor.submit(
+            profiler.bind(quick_processor.quick_process), url, lang, deadline, slice_params
+        )
+        try:
+            result = future.result(timeout=deadline.remaining())
+        except FutureTimeoutError:
+            logger.error(f"快速字幕请求超时: {url}")
+            result = {
+                'status': 'error',
+                'code': 'TIMEOUT',
+                'error': '处理超时'
+            }
+        return json_response(result)
         
     except Exception as e:
         logger.error(f"处理请求失败: {str(e)}")
         return jsonify({
             'status': 'error',
             'message': str(e)
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@bp.route('/search', methods=['GET', 'POST'])
+def search_subtitles():
+    """在已获取的字幕中进行全文搜索"""
+    try:
+        if request.method == 'POST':
+            params = request.get_json(silent=True) or {}
+        else:
+            params = request.args
+        query = (params.get('q') or '').strip()
+        if not query:
+            return jsonify({
+                'status': 'error',
+                'message': '缺少必要的参数 q'
+            }), 400
+
+        lang = params.get('lang')
+        limit = min(max(int(params.get('limit', 20)), 1), 100)
+
+        started = time.perf_counter()
+        results = search_index.search(query, lang=lang, limit=limit)
+        took_ms = (time.perf_counter() - started) * 1000
+
+        return jsonify({
+            'status': 'success',
+            'query': query,
+            'took_ms': round(took_ms, 2),
+            'results': results
+        })
+
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'参数错误: {str(e)}'
+        }), 400
+    except Exception as e:
+        logger.error(f"搜索失败: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@bp.route('/watchlist', methods=['GET', 'POST'])
+def watchlist_entries():
+    """观察列表：GET 查看新鲜度统计，POST 添加视频/播放列表/频道"""
+    try:
+        if request.method == 'GET':
+            return jsonify({
+                'status': 'success',
+                **watchlist.stats()
+            })
+
+        data = request.get_json(silent=True)
+        if not data or 'url' not in data:
+            return jsonify({
+                'status': 'error',
+                'message': '缺少必要的参数 url'
+            }), 400
+
+        entry = watchlist.add(
+            data['url'],
+            lang=data.get('lang', 'en'),
+            convert_to=data.get('convert'),
+            interval_minutes=data.get('interval_minutes')
+        )
+        logger.info(f"添加观察项: {entry}")
+        return jsonify({
+            'status': 'success',
+            'watch': entry
+        })
+
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"观察列表操作失败: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@bp.route('/watchlist/<int:watch_id>', methods=['DELETE'])
+def watchlist_remove(watch_id):
+    """删除观察项"""
+    if not watchlist.remove(watch_id):
+        return jsonify({
+            'status': 'error',
+            'message': f'观察项不存在: {watch_id}'
+        }), 404
+    return jsonify({'status': 'success'})
+
+@bp.route('/watchlist/<int:watch_id>/refresh', methods=['POST'])
+def watchlist_refresh(watch_id):
+    """立即刷新观察项（在下一个调度周期执行）"""
+    if not watchlist.mark_due(watch_id):
+        return jsonify({
+            'status': 'error',
+            'message': f'观察项不存在: {watch_id}'
+        }), 404
+    return jsonify({'status': 'success'})
+
+def _admin_authorized() -> bool:
+    """校验管理接口令牌（Authorization: Bearer <ADMIN_TOKEN>）"""
+    header = request.headers.get('Authorization', '')
+    token = header[7:] if header.startswith('Bearer ') else ''
+    return bool(config.ADMIN_TOKEN) and hmac.compare_digest(token, config.ADMIN_TOKEN)
+
+@bp.route('/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    """采样分析：POST 开始采样，GET 查看状态和上次结果，DELETE 提前结束"""
+    if not config.ADMIN_TOKEN:
+        return jsonify({
+            'status': 'error',
+            'message': '管理接口未启用（未配置 ADMIN_TOKEN）'
+        }), 403
+    if not _admin_authorized():
+        return jsonify({
+            'status': 'error',
+            'message': '未授权'
+        }), 401
+
+    if request.method == 'DELETE':
+        profiler.stop()
+        return jsonify({'status': 'success', 'profiler': profiler.status()})
+
+    if request.method == 'GET':
+        profile = profiler.last_profile
+        if request.args.get('format') == 'folded':
+            if not profile:
+                return jsonify({
+                    'status': 'error',
+                    'message': '暂无采样结果'
+                }), 404
+            return Response(profile['folded'] + '\n', mimetype='text/plain')
+        return jsonify({
+            'status': 'success',
+            'profiler': profiler.status(),
+            'last_profile': {k: v for k, v in profile.items() if k != 'folded'} if profile else None
+        })
+
+    data = request.get_json(silent=True) or {}
+    try:
+        status = profiler.start(
+            seconds=data.get('seconds'),
+            requests=data.get('requests'),
+            interval_ms=data.get('interval_ms'),
+            all_threads=bool(data.get('all_threads', False))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'参数错误: {str(e)}'
+        }), 400
+    except RuntimeError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 409
+    return jsonify({'status': 'success', 'profiler': status})
@@ -0,0 +1,275 @@
+import sys
+import time
+import queue
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+from .cues import Cue, iter_cues, parse_cues, parse_subtitle_filename
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# 每个写事务写入的字幕条数，长字幕分多个短事务写入，避免长时间占用写锁
+INDEX_BATCH_SIZE = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    type TEXT,
+    path TEXT,
+    indexed_at REAL NOT NULL,
+    UNIQUE (video_id, lang)
+);
+CREATE TABLE IF NOT EXISTS cues (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    cue_index INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cues_doc ON cues(doc_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS cues_fts USING fts5(
+    text, content='cues', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS cues_ai AFTER INSERT ON cues BEGIN
+    INSERT INTO cues_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS cues_ad AFTER DELETE ON cues BEGIN
+    INSERT INTO cues_fts(cues_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+class SubtitleSearchIndex:
+    """基于 SQLite FTS5 的字幕全文索引
+
+    每条字幕（cue）作为一行写入，保存 video_id、语言和时间戳，
+    搜索时返回匹配的视频及带时间戳的片段。
+    请求路径中通过 enqueue 交给后台线程写入；写入使用共享的写连接和写锁，
+    搜索使用每个线程独立的只读连接，不等待写锁（WAL 模式下读写互不阻塞）。
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟创建写连接（多个 Passenger 进程共享同一个数据库文件）"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(exist_ok=True, parents=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """每个线程一个只读连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 确保数据库和表结构已创建
+            with self._lock:
+                self._connect()
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute('PRAGMA query_only=ON')
+            self._local.conn = conn
+        return conn
+
+    def index_cues(self, video_id: str, lang: str, cues: Iterable[Cue],
+                   sub_type: Optional[str] = None, path: Optional[str] = None) -> int:
+        """写入（或替换）一个视频某种语言的全部字幕，返回写入条数
+
+        cues 可以是生成器，每次解析 INDEX_BATCH_SIZE 条后在一个短事务中写入，
+        解析期间不持有写锁，也不在内存中保留全部字幕。
+        写入过程中搜索只能看到该视频已写入的部分字幕。
+        """
+        cues = iter(cues)
+        count = 0
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'DELETE FROM documents WHERE video_id = ? AND lang = ?',
+                    (video_id, lang)
+                )
+                cursor = conn.execute(
+                    'INSERT INTO documents (video_id, lang, type, path, indexed_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (video_id, lang, sub_type, path, time.time())
+                )
+                doc_id = cursor.lastrowid
+
+        while True:
+            rows = [(doc_id, c.index, c.start_ms, c.end_ms, c.text) for c in islice(cues, INDEX_BATCH_SIZE)]
+            if not rows:
+                break
+            with self._lock:
+                with conn:
+                    conn.executemany(
+                        'INSERT INTO cues (doc_id, cue_index, start_ms, end_ms, text) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        rows
+                    )
+            count += len(rows)
+        logger.debug(f"已索引字幕: {video_id} ({lang}), {count} 条")
+        return count
+
+    def index_content(self, video_id: str, lang: str, ttml_content: str,
+                      sub_type: Optional[str] = None, path: Optional[str] = None):
+        """解析 TTML 内容并写入索引"""
+        self.index_cues(video_id, lang, parse_cues(ttml_content), sub_type, path)
+
+    def index_file(self, ttml_path: Path, sub_type: Optional[str] = None) -> bool:
+        """解析 TTML 文件并写入索引，文件名无法识别时返回 False"""
+        parsed = parse_subtitle_filename(ttml_path)
+        if not parsed:
+            return False
+        video_id, lang = parsed
+        if sub_type is None and str(ttml_path).endswith('.auto.ttml'):
+            sub_type = 'auto'
+        self.index_cues(video_id, lang, iter_cues(str(ttml_path)), sub_type, str(ttml_path))
+        return True
+
+    def safe_index_file(self, ttml_path: Path, sub_type: Optional[str] = None):
+        """写入索引，失败时只记录日志，不影响字幕请求本身"""
+        try:
+            self.index_file(Path(ttml_path), sub_type)
+        except Exception as e:
+            logger.error(f"写入搜索索引失败: {ttml_path}, 错误: {e}")
+
+    def enqueue(self, ttml_path: Path, sub_type: Optional[str] = None):
+        """交给后台线程写入索引，不阻塞字幕请求"""
+        self._queue.put((Path(ttml_path), sub_type))
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='search-indexer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            ttml_path, sub_type = self._queue.get()
+            try:
+                self.safe_index_file(ttml_path, sub_type)
+            finally:
+                self._queue.task_done()
+
+    def reindex(self, directory: Path) -> Dict:
+        """重建目录下所有 TTML 字幕的索引"""
+        stats = {'indexed': 0, 'skipped': 0, 'failed': 0}
+        for ttml_path in sorted(Path(directory).glob('*.ttml')):
+            try:
+                if self.index_file(ttml_path):
+                    stats['indexed'] += 1
+                else:
+                    stats['skipped'] += 1
+            except Exception as e:
+                stats['failed'] += 1
+                logger.error(f"索引失败: {ttml_path}, 错误: {e}")
+        return stats
+
+    @staticmethod
+    def _build_match_query(query: str) -> str:
+        """将用户输入转换为 FTS5 查询：每个词按短语处理，避免语法错误"""
+        terms = [t.replace('"', '""') for t in query.split()]
+        return ' '.join(f'"{t}"' for t in terms if t)
+
+    def search(self, query: str, lang: Optional[str] = None, limit: int = 20,
+               snippets_per_video: int = 5) -> List[Dict]:
+        """搜索字幕，按视频分组返回带时间戳的匹配片段"""
+        match_query = self._build_match_query(query)
+        if not match_query:
+            return []
+
+        sql = (
+            'SELECT d.video_id, d.lang, d.type, c.cue_index, c.start_ms, c.end_ms, '
+            "snippet(cues_fts, 0, '[', ']', '…', 16) "
+            'FROM cues_fts '
+            'JOIN cues c ON c.id = cues_fts.rowid '
+            'JOIN documents d ON d.id = c.doc_id '
+            'WHERE cues_fts MATCH ?'
+        )
+        params = [match_query]
+        if lang:
+            sql += ' AND d.lang = ?'
+            params.append(lang)
+        # 多取一些行，以便按视频分组后仍有足够的结果
+        sql += ' ORDER BY rank LIMIT ?'
+        params.append(limit * snippets_per_video)
+
+        rows = self._reader().execute(sql, params).fetchall()
+
+        videos = {}
+        for video_id, row_lang, sub_type, cue_index, start_ms, end_ms, snippet in rows:
+            key = (video_id, row_lang)
+            if key not in videos:
+                if len(videos) >= limit:
+                    continue
+                videos[key] = {
+                    'video_id': video_id,
+                    'lang': row_lang,
+                    'type': sub_type,
+                    'url': f"https://www.youtube.com/watch?v={video_id}",
+                    'snippets': []
+                }
+            snippets = videos[key]['snippets']
+            if len(snippets) < snippets_per_video:
+                snippets.append({
+                    'index': cue_index,
+                    'start_ms': start_ms,
+                    'end_ms': end_ms,
+                    'text': snippet
+                })
+        return list(videos.values())
+
+    def stats(self) -> Dict:
+        """索引统计信息"""
+        conn = self._reader()
+        documents = conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        cues = conn.execute('SELECT COUNT(*) FROM cues').fetchone()[0]
+        return {'documents': documents, 'cues': cues, 'pending': self._queue.qsize()}
+
+
+search_index = SubtitleSearchIndex(config.SEARCH_INDEX_PATH)
+
+
+def main(argv=None):
+    """命令行入口: python -m src.search_index reindex [--dir DIR]"""
+    parser = argparse.ArgumentParser(description='字幕全文索引管理')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    reindex_parser = subparsers.add_parser('reindex', help='重建字幕目录的全文索引')
+    reindex_parser.add_argument('--dir', default=str(config.SUBTITLE_DIR), help='字幕目录')
+    search_parser = subparsers.add_parser('search', help='搜索字幕')
+    search_parser.add_argument('query')
+    search_parser.add_argument('--lang')
+    search_parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format=config.LOG_FORMAT)
+
+    if args.command == 'reindex':
+        started = time.time()
+        stats = search_index.reindex(Path(args.dir))
+        print(f"索引完成: {stats}, 耗时 {time.time() - started:.1f}s")
+    elif args.command == 'search':
+        for video in search_index.search(args.query, args.lang, args.limit):
+            print(f"{video['url']} ({video['lang']})")
+            for snippet in video['snippets']:
+                print(f"  [{snippet['start_ms'] / 1000:.1f}s] {snippet['text']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import re
+import logging
+from pathlib import Path
+from typing import Dict, Mapping, NamedTuple, Optional
+from urllib.parse import urlparse, parse_qs
+from .cues import CueTrack, RENDERERS, load_track
+
+logger = logging.getLogger(__name__)
+
+# 时间参数: 秒数 (3600 / 3600.5 / 3600s)、YouTube t= 格式 (1h2m3s) 或时钟格式 (01:02:03)
+SECONDS_REGEX = re.compile(r'^(\d+(?:\.\d+)?)s?$')
+HMS_REGEX = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+(?:\.\d+)?)s)?$')
+CLOCK_REGEX = re.compile(r'^(?:(\d+):)?(\d{1,2}):(\d{1,2}(?:\.\d+)?)$')
+
+
+class SliceSpec(NamedTuple):
+    """字幕切片范围：时间窗口（毫秒）或字幕序号范围"""
+    start_ms: int = 0
+    end_ms: Optional[int] = None
+    start_index: Optional[int] = None
+    end_index: Optional[int] = None
+
+
+def parse_timestamp(value) -> int:
+    """将时间参数转换为毫秒
+    Raises:
+        ValueError: 无法解析
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value < 0:
+            raise ValueError(f"时间不能为负数: {value}")
+        return int(round(value * 1000))
+
+    text = str(value).strip().lower()
+    match = SECONDS_REGEX.match(text)
+    if match:
+        return int(round(float(match.group(1)) * 1000))
+
+    match = CLOCK_REGEX.match(text)
+    if match:
+        hours, minutes, seconds = match.groups()
+        return int(round((int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)) * 1000))
+
+    match = HMS_REGEX.match(text)
+    if text and match:
+        hours, minutes, seconds = match.groups()
+        return int(round((int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds or 0)) * 1000))
+
+    raise ValueError(f"无法解析的时间: {value}")
+
+
+def url_start_ms(url: str) -> Optional[int]:
+    """读取 URL 中的 t= 参数（查询参数或 #t= 片段），没有或无法解析时返回 None"""
+    try:
+        parsed = urlparse(url)
+        values = parse_qs(parsed.query).get('t') or parse_qs(parsed.fragment).get('t')
+        return parse_timestamp(values[0]) if values else None
+    except ValueError:
+        return None
+
+
+def slice_params(data: Mapping) -> Optional[Dict]:
+    """从请求参数中提取切片参数，未指定任何切片参数时返回 None
+    Raises:
+        ValueError: 参数无效
+    """
+    params = {}
+    for key in ('start', 'end'):
+        if data.get(key) is not None:
+            params[f'{key}_ms'] = parse_timestamp(data[key])
+    for key in ('start_index', 'end_index'):
+        if data.get(key) is not None:
+            params[key] = int(data[key])
+    if not params:
+        return None
+
+    if 'start_ms' in params and 'end_ms' in params and params['end_ms'] <= params['start_ms']:
+        raise ValueError("end 必须大于 start")
+    if 'start_index' in params and 'end_index' in params and params['end_index'] < params['start_index']:
+        raise ValueError("end_index 不能小于 start_index")
+    return params
+
+
+def build_spec(params: Dict, url: str) -> SliceSpec:
+    """生成某个 URL 的切片范围：未指定 start 时使用 URL 中的 t= 作为起点"""
+    start_ms = params.get('start_ms')
+    if start_ms is None:
+        start_ms = url_start_ms(url) or 0
+    return SliceSpec(
+        start_ms=start_ms,
+        end_ms=params.get('end_ms'),
+        start_index=params.get('start_index'),
+        end_index=params.get('end_index')
+    )
+
+
+def slice_track(track: CueTrack, spec: SliceSpec) -> list:
+    """按切片范围选取字幕：指定了序号范围时按序号，否则按时间窗口"""
+    if spec.start_index is not None or spec.end_index is not None:
+        return track.slice_index(spec.start_index or 1, spec.end_index)
+    return track.slice_time(spec.start_ms, spec.end_ms)
+
+
+def track_for_result(result: Dict) -> CueTrack:
+    """获取结果对应的字幕轨道索引：优先使用缓存的文件索引，文件已清理时索引原始内容"""
+    path = result.get('path')
+    if path and Path(path).exists():
+        return load_track(Path(path))
+    return CueTrack(str(result['content']).encode('utf-8'))
+
+
+def apply_slice(result: Dict, spec: SliceSpec, convert_to: Optional[str] = None) -> Dict:
+    """对批处理结果进行切片，content 渲染为 TTML，converted_content 渲染为目标格式"""
+    if result.get('status') != 'success':
+        return result
+
+    cues = slice_track(track_for_result(result), spec)
+    sliced = dict(result)
+    sliced['content'] = RENDERERS['ttml'](cues)
+    target_format = (convert_to or '').lower()
+    if target_format in RENDERERS and 'converted_content' in result:
+        sliced['converted_content'] = RENDERERS[target_format](cues)
+    sliced['slice'] = {
+        'start_ms': spec.start_ms,
+        'end_ms': spec.end_ms,
+        'start_index': spec.start_index,
+        'end_index': spec.end_index,
+        'cue_count': len(cues)
+    }
+    return sliced
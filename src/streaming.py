@@ -0,0 +1,120 @@
+import os
+import json
+import uuid
+import codecs
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
+from flask import Response
+from .profiler import stage
+
+CHUNK_SIZE = 64 * 1024
+
+
+class FileContent:
+    """磁盘上的文本文件（原始 TTML 或转换结果），序列化响应时分块输出，不一次性载入内存"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def iter_chunks(self) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with open(self.path, 'rb') as f:
+            while True:
+                block = f.read(CHUNK_SIZE)
+                if not block:
+                    break
+                text = decoder.decode(block)
+                if text:
+                    yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    def read(self) -> str:
+        return ''.join(self.iter_chunks())
+
+    def __str__(self):
+        return self.read()
+
+
+def write_stream(output_path: Path, chunks: Iterable[str]) -> Path:
+    """将转换结果逐块写入文件（先写临时文件再替换，避免并发读取到不完整内容）"""
+    tmp_path = output_path.with_name(f"{output_path.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        with tmp_path.open('w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return output_path
+
+
+def iter_encode(obj) -> Iterator[str]:
+    """流式 JSON 编码（紧凑格式），FileContent 按块转义输出"""
+    if isinstance(obj, FileContent):
+        yield '"'
+        for chunk in obj.iter_chunks():
+            # 逐字符转义，分块边界不影响结果
+            yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+        yield '"'
+    elif isinstance(obj, dict):
+        yield '{'
+        for i, (key, value) in enumerate(obj.items()):
+            yield (',' if i else '') + json.dumps(str(key), ensure_ascii=False) + ':'
+            yield from iter_encode(value)
+        yield '}'
+    elif isinstance(obj, (list, tuple)):
+        yield '['
+        for i, value in enumerate(obj):
+            if i:
+                yield ','
+            yield from iter_encode(value)
+        yield ']'
+    else:
+        yield json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _buffered(chunks: Iterator[str], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """合并小块输出，减少写入 socket 的次数"""
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _encode_stream(obj) -> Iterator[bytes]:
+    """编码响应体（编码在写出响应时才执行，此时标注为 encode 阶段）"""
+    with stage('encode'):
+        yield from _buffered(iter_encode(obj))
+
+
+def describe_content(value) -> str:
+    """日志中的内容摘要（不读取、不 stat 磁盘文件）"""
+    if isinstance(value, FileContent):
+        return f"<file {value.path.name}>"
+    return f"<{len(value)} chars>"
+
+
+def json_response(obj, status: int = 200) -> Response:
+    """以流式方式返回 JSON 响应，大字幕内容直接从磁盘分块写入 socket"""
+    return Response(_encode_stream(obj), status=status, mimetype='application/json')
+
+
+def encode_lazy(obj):
+    """json.dumps 的 default 钩子：FileContent 只保存路径（分布式 worker 与 Web 进程共享存储）"""
+    if isinstance(obj, FileContent):
+        return {'$file': str(obj.path)}
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def decode_lazy(obj: Dict):
+    """json.loads 的 object_hook：还原 FileContent"""
+    if len(obj) == 1 and '$file' in obj:
+        return FileContent(obj['$file'])
+    return obj
@@ -1,8 +1,7 @@
 import re
 import time
-import json
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from typing import List, Dict, Optional
 import logging
 from queue import Queue
@@ -10,10 +9,19 @@ import subprocess
 from tenacity import retry, stop_after_attempt, wait_exponential
 import yt_dlp
 from .config import config
+from .search_index import search_index
+from .broker import broker
+from .deadline import Deadline, DeadlineExceeded, stop_at_deadline, timeout_result
+from .ydl import extract_subtitles
+from .slicing import apply_slice, build_spec
+from .cues import iter_cues, iter_json, iter_txt
+from .streaming import FileContent, write_stream
+from .profiler import profiler, stage
+from .cache import TTLCache
 from functools import lru_cache
-from datetime import datetime, timedelta
 import os
-import xml.etree.ElementTree as ET
+import json
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -48,10 +56,8 @@ class SubtitleProcessor:
         }
         # 缓存过期时间（分钟）
         self.cache_ttl = int(os.getenv("CACHE_TTL_MINUTES", 30))
-        # 缓存结果
-        self._cache = {}
-        # 缓存时间戳
-        self._cache_timestamps = {}
+        # 缓存结果（线程安全，按写入时间过期，内容总大小不超过 CACHE_MAX_MB）
+        self._cache = TTLCache(self.cache_ttl * 60, max_bytes=int(config.CACHE_MAX_MB * 1024 * 1024))
         
     def log_message(self, message: str, level: str = 'info'):
         """记录日志消息"""
@@ -73,14 +79,21 @@ class SubtitleProcessor:
     def validate_url(self, url: str) -> bool:
         """验证YouTube URL"""
         return bool(self.YT_REGEX.match(url))
+
+    def extract_video_id(self, url: str) -> Optional[str]:
+        """从YouTube URL中提取视频ID，无效URL返回None"""
+        match = self.YT_REGEX.match(url) if isinstance(url, str) else None
+        return match.group(4) if match else None
         
     @retry(
-        stop=stop_after_attempt(3),
+        stop=stop_after_attempt(3) | stop_at_deadline,
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
-    def download_subtitle(self, url: str, lang: str) -> Dict:
+    def download_subtitle(self, url: str, lang: str, deadline: Optional[Deadline] = None) -> Dict:
         """下载字幕(带重试机制)
         先尝试下载普通字幕，如果没有再尝试自动生成的字幕
+        deadline 过期后不再重试，返回 TIMEOUT 结果
+        总是覆盖已存在的字幕文件：只有缓存未命中或刷新时才会下载，旧文件可能已过期
         """
         try:
             logger.info(f"开始下载字幕: URL={url}, 语言={lang}")
@@ -97,36 +110,38 @@ class SubtitleProcessor:
                 'writesubtitles': True,
                 'writeautomaticsub': False,
                 'subtitleslangs': [lang],
-                'subtitlesformat': 'ttml'
+                'subtitlesformat': 'ttml',
+                'overwrites': True
             })
             
-            with yt_dlp.YoutubeDL(normal_opts) as ydl:
-                try:
-                    logger.info(f"尝试下载普通字幕: {url}")
-                    info = ydl.extract_info(url, download=True)
-                    video_id = info['id']
+            try:
+                logger.info(f"尝试下载普通字幕: {url}")
+                info = extract_subtitles(normal_opts, url, deadline)
+                video_id = info['id']
                     
-                    # 检查普通字幕文件（检查所有可能的文件名模式）
-                    possible_paths = [
-                        config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",  # 普通字幕
-                        config.SUBTITLE_DIR / f"{video_id}.en.ttml"  # 默认英文字幕
-                    ]
+                # 检查普通字幕文件（检查所有可能的文件名模式）
+                possible_paths = [
+                    config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",  # 普通字幕
+                    config.SUBTITLE_DIR / f"{video_id}.en.ttml"  # 默认英文字幕
+                ]
                     
-                    for sub_path in possible_paths:
-                        if sub_path.exists():
-                            logger.info(f"找到普通字幕: {sub_path}")
-                            content = sub_path.read_text(encoding='utf-8')
-                            return {
-                                'status': 'success',
-                                'url': url,
-                                'video_id': video_id,
-                                'path': str(sub_path),
-                                'content': content,
-                                'type': 'normal'
-                            }
+                for sub_path in possible_paths:
+                    if sub_path.exists():
+                        logger.info(f"找到普通字幕: {sub_path}")
+                        content = FileContent(sub_path)
+                        return {
+                            'status': 'success',
+                            'url': url,
+                            'video_id': video_id,
+                            'path': str(sub_path),
+                            'content': content,
+                            'type': 'normal'
+                        }
                             
-                except Exception as e:
-                    logger.info(f"未找到普通字幕，尝试自动生成字幕: {str(e)}")
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.info(f"未找到普通字幕，尝试自动生成字幕: {str(e)}")
             
             # 2. 如果没有普通字幕，尝试下载自动生成的字幕
             auto_opts = self.ydl_opts.copy()
@@ -134,47 +149,50 @@ class SubtitleProcessor:
                 'writesubtitles': False,
                 'writeautomaticsub': True,
                 'subtitleslangs': [lang],
-                'subtitlesformat': 'ttml'
+                'subtitlesformat': 'ttml',
+                'overwrites': True
             })
             
-            with yt_dlp.YoutubeDL(auto_opts) as ydl:
-                try:
-                    logger.info(f"尝试下载自动生成字幕: {url}")
-                    info = ydl.extract_info(url, download=True)
-                    video_id = info['id']
+            try:
+                logger.info(f"尝试下载自动生成字幕: {url}")
+                info = extract_subtitles(auto_opts, url, deadline)
+                video_id = info['id']
                     
-                    # 检查自动生成的字幕文件（检查所有可能的文件名模式）
-                    possible_auto_paths = [
-                        config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",  # 自动字幕
-                        config.SUBTITLE_DIR / f"{video_id}.en.ttml",  # 默认英文自动字幕
-                        config.SUBTITLE_DIR / f"{video_id}.{lang}.auto.ttml"  # 带auto标记的自动字幕
-                    ]
+                # 检查自动生成的字幕文件（检查所有可能的文件名模式）
+                possible_auto_paths = [
+                    config.SUBTITLE_DIR / f"{video_id}.{lang}.ttml",  # 自动字幕
+                    config.SUBTITLE_DIR / f"{video_id}.en.ttml",  # 默认英文自动字幕
+                    config.SUBTITLE_DIR / f"{video_id}.{lang}.auto.ttml"  # 带auto标记的自动字幕
+                ]
                     
-                    for auto_sub_path in possible_auto_paths:
-                        if auto_sub_path.exists():
-                            logger.info(f"找到自动生成字幕: {auto_sub_path}")
-                            content = auto_sub_path.read_text(encoding='utf-8')
-                            return {
-                                'status': 'success',
-                                'url': url,
-                                'video_id': video_id,
-                                'path': str(auto_sub_path),
-                                'content': content,
-                                'type': 'auto'
-                            }
+                for auto_sub_path in possible_auto_paths:
+                    if auto_sub_path.exists():
+                        logger.info(f"找到自动生成字幕: {auto_sub_path}")
+                        content = FileContent(auto_sub_path)
+                        return {
+                            'status': 'success',
+                            'url': url,
+                            'video_id': video_id,
+                            'path': str(auto_sub_path),
+                            'content': content,
+                            'type': 'auto'
+                        }
                     
-                    # 如果执行到这里，说明文件确实不存在
-                    logger.error("字幕文件下载成功但未找到文件")
-                    raise FileNotFoundError("字幕文件下载成功但未找到文件")
+                # 如果执行到这里，说明文件确实不存在
+                logger.error("字幕文件下载成功但未找到文件")
+                raise FileNotFoundError("字幕文件下载成功但未找到文件")
                     
-                except yt_dlp.utils.DownloadError as e:
-                    self.update_error_stats('download_errors')
-                    error_msg = str(e)
-                    logger.error(f"yt-dlp 下载错误: {error_msg}")
-                    if 'No subtitles available' in error_msg:
-                        return {'status': 'error', 'code': 'SUB_NOT_FOUND', 'message': '没有找到任何字幕'}
-                    return {'status': 'error', 'code': 'DOWNLOAD_FAILED', 'message': f'下载失败: {error_msg}'}
+            except yt_dlp.utils.DownloadError as e:
+                self.update_error_stats('download_errors')
+                error_msg = str(e)
+                logger.error(f"yt-dlp 下载错误: {error_msg}")
+                if 'No subtitles available' in error_msg:
+                    return {'status': 'error', 'code': 'SUB_NOT_FOUND', 'message': '没有找到任何字幕'}
+                return {'status': 'error', 'code': 'DOWNLOAD_FAILED', 'message': f'下载失败: {error_msg}'}
                     
+        except DeadlineExceeded as e:
+            logger.error(f"字幕下载超时: {url}, 阶段: {e.stage}")
+            return timeout_result(url, e.stage)
         except Exception as e:
             self.update_error_stats('download_errors')
             error_msg = str(e)
@@ -182,45 +200,166 @@ class SubtitleProcessor:
             logger.exception("详细错误信息:")
             return {'status': 'error', 'code': 'UNKNOWN_ERROR', 'message': f'字幕下载失败: {error_msg}'}
 
-    def process_batch(self, urls: List[str], lang: str = 'en', 
-                     convert_to: Optional[str] = None) -> List[Dict]:
-        """批量处理字幕下载和转换"""
-        total = len(urls)
+    def _plan_batch(self, urls: List[str], lang: str,
+                    convert_to: Optional[str]) -> tuple:
+        """批处理预处理：规范化URL、过滤无效URL、合并重复视频、命中缓存直接返回
+        Returns:
+            (results, slots, misses)
+            results: 与输入等长的结果列表，已确定的位置已填好
+            slots: video_id -> 需要该视频结果的输入位置列表
+            misses: video_id -> 实际需要下载的URL（取首次出现的写法）
+        """
+        results = [None] * len(urls)
+        slots = {}
+        misses = {}
+
+        for i, url in enumerate(urls):
+            video_id = self.extract_video_id(url)
+            if not video_id:
+                self.update_error_stats('validation_errors')
+                results[i] = {
+                    'status': 'error',
+                    'url': url,
+                    'code': 'INVALID_URL',
+                    'message': f'无效的YouTube URL: {url}'
+                }
+                continue
+
+            if video_id in slots:
+                slots[video_id].append(i)
+                continue
+            slots[video_id] = [i]
+
+            cached_result = self._get_from_cache(url, lang, convert_to)
+            if cached_result:
+                results[i] = cached_result
+            else:
+                misses[video_id] = url
+
+        return results, slots, misses
+
+    def _dispatch_local(self, misses: Dict[str, str], lang: str,
+                        convert_to: Optional[str], deadline: Deadline) -> Dict[str, Dict]:
+        """在本进程线程池中处理未命中缓存的视频，返回 video_id -> 结果"""
+        fetched = {}
         completed = 0
-        results = []
-        
-        logger.info(f"开始批量处理 {total} 个URL")
-        
-        with ThreadPoolExecutor(
-            max_workers=min(config.MAX_CONCURRENT_DOWNLOADS, total)
-        ) as executor:
-            # 创建所有任务
-            futures = []
-            for url in urls:
-                future = executor.submit(self.process_single, url, lang, convert_to)
-                futures.append((future, url))
+        executor = ThreadPoolExecutor(
+            max_workers=min(config.MAX_CONCURRENT_DOWNLOADS, len(misses))
+        )
+        futures = []
+        try:
+            # 只为未命中缓存的视频创建任务
+            for video_id, url in misses.items():
+                future = executor.submit(profiler.bind(self.process_single), url, lang, convert_to, deadline)
+                futures.append((future, video_id, url))
             
-            # 等待所有任务完成
-            for future, url in futures:
+            # 等待所有任务完成，最多等到请求截止时间
+            for future, video_id, url in futures:
                 try:
-                    result = future.result()
+                    fetched[video_id] = future.result(timeout=deadline.remaining())
                     logger.info(f"处理完成: {url}")
-                    results.append(result)
+                except FutureTimeoutError:
+                    logger.error(f"处理URL超时: {url}")
+                    fetched[video_id] = timeout_result(url, 'batch')
                 except Exception as e:
                     self.update_error_stats('process_errors')
                     error_msg = str(e)
                     logger.error(f"处理URL失败: {url}, 错误: {error_msg}")
-                    results.append({
+                    fetched[video_id] = {
                         'status': 'error',
                         'url': url,
                         'code': 'PROCESS_FAILED',
                         'message': error_msg
-                    })
+                    }
                 finally:
                     completed += 1
                     self.log_message(
-                        f"处理进度: {completed}/{total} ({completed/total*100:.1f}%)"
+                        f"处理进度: {completed}/{len(misses)} ({completed/len(misses)*100:.1f}%)"
                     )
+        finally:
+            # 取消尚未开始的任务；不等待仍卡住的线程（它们会在 yt-dlp socket 超时后自行结束），避免整个请求被挂起
+            # （不使用 shutdown(cancel_futures=True)，它需要 Python 3.9）
+            for future, *_ in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+        return fetched
+
+    def _dispatch_distributed(self, misses: Dict[str, str], lang: str,
+                              convert_to: Optional[str], deadline: Deadline) -> Dict[str, Dict]:
+        """通过任务队列交给 worker 进程处理，返回 video_id -> 结果"""
+        batch_id = uuid.uuid4().hex
+        items = [
+            {'video_id': video_id, 'url': url, 'lang': lang, 'convert_to': convert_to,
+             'expires_at': deadline.expires_at}
+            for video_id, url in misses.items()
+        ]
+        task_ids = broker.enqueue(batch_id, items)
+        logger.info(f"已提交 {len(task_ids)} 个任务到队列, 批次: {batch_id}")
+
+        try:
+            with stage('broker'):
+                collected = broker.wait(
+                    batch_id, task_ids,
+                    timeout=min(config.BROKER_RESULT_TIMEOUT, deadline.remaining()),
+                    poll_interval=config.BROKER_POLL_INTERVAL
+                )
+        finally:
+            # 结果已取回（或已超时），清理队列中该批次的任务
+            broker.purge(batch_id)
+
+        fetched = {}
+        for task_id, item in zip(task_ids, items):
+            result = collected.get(task_id)
+            if result is None:
+                result = timeout_result(item['url'], 'broker')
+            elif result.get('status') == 'success':
+                # worker 的缓存不与本进程共享，取回后写入本地缓存
+                self._save_to_cache(item['url'], lang, convert_to, result)
+            fetched[item['video_id']] = result
+        return fetched
+
+    def process_batch(self, urls: List[str], lang: str = 'en', 
+                     convert_to: Optional[str] = None,
+                     deadline: Optional[Deadline] = None,
+                     slice_params: Optional[Dict] = None) -> List[Dict]:
+        """批量处理字幕下载和转换
+        先进行规划（去重、校验、缓存），只有未命中缓存的视频才会提交到线程池，
+        结果按输入顺序返回；超过截止时间仍未完成的视频返回 TIMEOUT 结果。
+        指定 slice_params 时只返回时间窗口（或字幕序号范围）内的字幕，
+        未指定起点时使用各 URL 中的 t= 参数
+        """
+        if deadline is None:
+            deadline = Deadline(config.REQUEST_TIMEOUT)
+        total = len(urls)
+        results, slots, misses = self._plan_batch(urls, lang, convert_to)
+        
+        logger.info(
+            f"开始批量处理 {total} 个URL: {len(slots)} 个不同视频, "
+            f"{len(misses)} 个需要下载, {sum(r is None for r in results) - len(misses)} 个重复"
+        )
+        
+        if misses:
+            if config.DISTRIBUTED_MODE:
+                fetched = self._dispatch_distributed(misses, lang, convert_to, deadline)
+            else:
+                fetched = self._dispatch_local(misses, lang, convert_to, deadline)
+            for video_id, result in fetched.items():
+                results[slots[video_id][0]] = result
+        
+        # 按输入顺序还原结果，重复的URL共享同一结果
+        for indexes in slots.values():
+            shared = results[indexes[0]]
+            for i in indexes:
+                result = dict(shared)
+                result['url'] = urls[i]
+                if slice_params:
+                    try:
+                        with stage('slice'):
+                            result = apply_slice(result, build_spec(slice_params, urls[i]), convert_to)
+                    except Exception as e:
+                        logger.error(f"字幕切片失败: {urls[i]}, 错误: {str(e)}")
+                        result['slice_error'] = str(e)
+                results[i] = result
         
         logger.info(f"批量处理完成，成功处理 {len([r for r in results if r.get('status') == 'success'])} 个URL")
         return results
@@ -244,72 +383,27 @@ class SubtitleProcessor:
         except Exception as e:
             logger.error(f"清理文件失败: {str(e)}")
 
-    def _convert_to_txt(self, input_path: Path) -> Path:
-        """将 TTML 转换为纯文本格式"""
+    def _iter_cues(self, input_path: Path, deadline: Optional[Deadline] = None):
+        """流式读取字幕，定期检查转换阶段的截止时间"""
+        for i, cue in enumerate(iter_cues(str(input_path))):
+            if deadline and i % 500 == 0:
+                deadline.check('convert')
+            yield cue
+
+    def _convert_to_txt(self, input_path: Path, deadline: Optional[Deadline] = None) -> Path:
+        """将 TTML 转换为纯文本格式（流式解析和写入，内存占用与字幕长度无关）"""
         output_path = config.TEMP_DIR / f"{input_path.stem}.txt"
         try:
-            # 读取 TTML 文件
-            with open(input_path, 'r', encoding='utf-8') as f:
-                ttml_content = f.read()
-            
-            # 解析 TTML XML
-            root = ET.fromstring(ttml_content)
-            # 查找所有包含文本的元素（通常在 p 标签中）
-            # 使用命名空间通配符 {*} 来匹配任何命名空间
-            text_elements = root.findall(".//{*}p")
-            
-            # 提取纯文本
-            lines = []
-            for elem in text_elements:
-                text = ''.join(elem.itertext()).strip()
-                if text:
-                    lines.append(text)
-            
-            # 写入文本文件
-            text_content = '\n'.join(lines)
-            with output_path.open('w', encoding='utf-8') as f:
-                f.write(text_content)
-            
-            return output_path
+            return write_stream(output_path, iter_txt(self._iter_cues(input_path, deadline)))
         except Exception as e:
             logger.error(f"文本转换失败: {e}")
             raise RuntimeError(f"文本转换失败: {str(e)}")
 
-    def _convert_to_json(self, input_path: Path) -> Path:
-        """将 TTML 转换为 JSON 格式"""
+    def _convert_to_json(self, input_path: Path, deadline: Optional[Deadline] = None) -> Path:
+        """将 TTML 转换为紧凑 JSON 格式（流式解析和写入，内存占用与字幕长度无关）"""
         output_path = config.TEMP_DIR / f"{input_path.stem}.json"
         try:
-            # 读取 TTML 文件
-            with open(input_path, 'r', encoding='utf-8') as f:
-                ttml_content = f.read()
-            
-            # 解析 TTML XML
-            root = ET.fromstring(ttml_content)
-            # 查找所有 p 标签
-            text_elements = root.findall(".//{*}p")
-            
-            # 转换为 JSON 格式
-            entries = []
-            for i, elem in enumerate(text_elements, 1):
-                # 获取开始和结束时间
-                begin = elem.get('begin', '')
-                end = elem.get('end', '')
-                # 获取文本内容
-                text = ''.join(elem.itertext()).strip()
-                if text:
-                    entry = {
-                        'index': i,
-                        'start': begin,
-                        'end': end,
-                        'text': text
-                    }
-                    entries.append(entry)
-            
-            # 写入 JSON 文件
-            with output_path.open('w', encoding='utf-8') as f:
-                json.dump(entries, f, ensure_ascii=False, indent=2)
-            
-            return output_path
+            return write_stream(output_path, iter_json(self._iter_cues(input_path, deadline)))
         except Exception as e:
             logger.error(f"JSON 转换失败: {e}")
             raise RuntimeError(f"JSON 转换失败: {str(e)}")
@@ -320,76 +414,141 @@ class SubtitleProcessor:
         return f"{config.CDN_URL}/{video_id}"
 
     def _get_cache_key(self, url: str, lang: str, convert_to: Optional[str] = None) -> str:
-        """生成缓存键"""
-        return f"{url}:{lang}:{convert_to}"
+        """生成缓存键（同一视频的不同URL写法共享缓存）"""
+        return f"{self.extract_video_id(url) or url}:{lang}:{convert_to}"
         
     def _get_from_cache(self, url: str, lang: str, convert_to: Optional[str] = None) -> Optional[Dict]:
-        """从缓存获取结果"""
-        cache_key = self._get_cache_key(url, lang, convert_to)
-        if cache_key in self._cache:
-            # 检查是否过期
-            timestamp = self._cache_timestamps.get(cache_key)
-            if timestamp and datetime.now() - timestamp < timedelta(minutes=self.cache_ttl):
-                logger.info(f"从缓存获取结果: {url}")
-                return self._cache[cache_key]
-            else:
-                # 删除过期缓存
-                self._cache.pop(cache_key, None)
-                self._cache_timestamps.pop(cache_key, None)
-        return None
+        """从缓存获取结果（内容文件已被清理的条目视为未命中并删除）"""
+        with stage('cache'):
+            cache_key = self._get_cache_key(url, lang, convert_to)
+            result = self._cache.get(cache_key)
+            if result is None:
+                return None
+            if not self._cached_files_exist(result):
+                # 其他进程退出时会清空临时目录，字幕文件也可能已被定期清理
+                logger.info(f"缓存的字幕文件已不存在，重新处理: {url}")
+                self._cache.pop(cache_key)
+                return None
+            logger.info(f"从缓存获取结果: {url}")
+            return result
+
+    def _cached_files_exist(self, result: Dict) -> bool:
+        """缓存结果引用的磁盘文件是否都还存在"""
+        return all(
+            value.path.exists() for value in result.values() if isinstance(value, FileContent)
+        )
         
     def _save_to_cache(self, url: str, lang: str, convert_to: Optional[str], result: Dict):
-        """保存结果到缓存"""
-        cache_key = self._get_cache_key(url, lang, convert_to)
-        self._cache[cache_key] = result
-        self._cache_timestamps[cache_key] = datetime.now()
-        
-        # 清理过期缓存
-        self._clean_expired_cache()
-        
-    def _clean_expired_cache(self):
-        """清理过期缓存"""
-        now = datetime.now()
-        expired_keys = [
-            key for key, timestamp in self._cache_timestamps.items()
-            if now - timestamp >= timedelta(minutes=self.cache_ttl)
-        ]
-        for key in expired_keys:
-            self._cache.pop(key, None)
-            self._cache_timestamps.pop(key, None)
+        """保存结果到缓存（写入时顺带清理已过期的条目）"""
+        with stage('cache'):
+            # 保存副本，之后对 result 的修改不影响已缓存的条目
+            self._cache.set(self._get_cache_key(url, lang, convert_to), dict(result))
+
+    def cache_stats(self) -> Dict:
+        """内存缓存统计"""
+        return self._cache.stats()
             
+    def _disk_meta_path(self, video_id: str, lang: str) -> Path:
+        """磁盘缓存元数据文件路径"""
+        return config.SUBTITLE_DIR / f"{video_id}.{lang}.meta.json"
+
+    def _read_disk_meta(self, video_id: str, lang: str) -> Optional[Dict]:
+        """读取磁盘缓存元数据，不存在或字幕文件已被清理时返回 None"""
+        try:
+            meta = json.loads(self._disk_meta_path(video_id, lang).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        return meta if Path(meta['path']).exists() else None
+
+    def disk_cache_age(self, video_id: str, lang: str) -> Optional[float]:
+        """磁盘缓存的年龄（秒），不存在时返回 None"""
+        meta = self._read_disk_meta(video_id, lang)
+        return time.time() - meta['fetched_at'] if meta else None
+
+    def _get_from_disk(self, url: str, lang: str) -> Optional[Dict]:
+        """从磁盘缓存获取字幕（多个进程共享，由预取任务或其他进程写入）"""
+        video_id = self.extract_video_id(url)
+        if not video_id or config.DISK_CACHE_TTL_MINUTES <= 0:
+            return None
+        meta = self._read_disk_meta(video_id, lang)
+        if not meta or time.time() - meta['fetched_at'] >= config.DISK_CACHE_TTL_MINUTES * 60:
+            return None
+
+        path = Path(meta['path'])
+        logger.info(f"从磁盘缓存获取字幕: {url}")
+        return {
+            'status': 'success',
+            'url': url,
+            'video_id': video_id,
+            'path': str(path),
+            'content': FileContent(path),
+            'type': meta.get('type')
+        }
+
+    def _save_to_disk(self, lang: str, sub_data: Dict):
+        """记录磁盘缓存元数据（字幕文件本身已由 yt-dlp 写入）"""
+        meta_path = self._disk_meta_path(sub_data['video_id'], lang)
+        tmp_path = meta_path.with_name(f"{meta_path.name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            tmp_path.write_text(json.dumps({
+                'path': sub_data['path'],
+                'type': sub_data.get('type'),
+                'fetched_at': time.time()
+            }), encoding='utf-8')
+            os.replace(tmp_path, meta_path)
+        except OSError as e:
+            logger.error(f"写入磁盘缓存元数据失败: {e}")
+            tmp_path.unlink(missing_ok=True)
+
     def process_single(self, url: str, lang: str, 
-                      convert_to: Optional[str] = None) -> Dict:
+                      convert_to: Optional[str] = None,
+                      deadline: Optional[Deadline] = None,
+                      refresh: bool = False) -> Dict:
         """处理单个URL的字幕
         Args:
             url: YouTube URL
             lang: 字幕语言代码
             convert_to: 转换格式，可选值：txt, json, None（默认不转换）
+            deadline: 请求截止时间，过期后返回 TIMEOUT 结果
+            refresh: 忽略缓存，重新下载字幕（用于预取刷新）
         """
         try:
-            # 1. 检查缓存
-            cached_result = self._get_from_cache(url, lang, convert_to)
-            if cached_result:
-                return cached_result
+            # 1. 检查缓存（内存缓存，然后是多进程共享的磁盘缓存）
+            if not refresh:
+                cached_result = self._get_from_cache(url, lang, convert_to)
+                if cached_result:
+                    return cached_result
+            with stage('cache'):
+                sub_data = None if refresh else self._get_from_disk(url, lang)
+            from_disk = sub_data is not None
                 
             # 2. 下载字幕
-            sub_data = self.download_subtitle(url, lang)
-            if sub_data['status'] != 'success':
-                return sub_data
+            if not from_disk:
+                if deadline and deadline.expired():
+                    return timeout_result(url, 'queue')
+                sub_data = self.download_subtitle(url, lang, deadline=deadline)
+                if sub_data['status'] != 'success':
+                    return sub_data
+                with stage('cache'):
+                    self._save_to_disk(lang, sub_data)
             
             # 3. 先保存到缓存并准备返回数据
             self._save_to_cache(url, lang, None, sub_data)  # 保存原始数据
+            if config.SEARCH_INDEX_ENABLED and not from_disk:
+                search_index.enqueue(sub_data['path'], sub_data.get('type'))
             
             # 4. 在后台进行格式转换（如果指定了转换格式）
             if convert_to and convert_to.lower() in ['txt', 'json']:
                 try:
                     converted_path = self.convert_format(
                         sub_data['path'],
-                        convert_to.lower()
+                        convert_to.lower(),
+                        deadline.stage(config.CONVERT_TIMEOUT) if deadline else None
                     )
                     # 转换完成后更新缓存
                     sub_data['converted_path'] = str(converted_path)
-                    sub_data['converted_content'] = converted_path.read_text(encoding='utf-8')
+                    # 内容保留在磁盘上，响应时再分块输出
+                    sub_data['converted_content'] = FileContent(converted_path)
                     self._save_to_cache(url, lang, convert_to, sub_data)  # 保存转换后的数据
                 except Exception as e:
                     self.update_error_stats('convert_errors')
@@ -406,15 +565,18 @@ class SubtitleProcessor:
                 'message': str(e)
             }
 
-    def convert_format(self, input_path: str, target_format: str) -> Path:
+    def convert_format(self, input_path: str, target_format: str,
+                       deadline: Optional[Deadline] = None) -> Path:
         """转换字幕格式
         Args:
             input_path: 输入文件路径
             target_format: 目标格式，支持：txt, json
+            deadline: 转换阶段的截止时间
         Returns:
             转换后的文件路径
         Raises:
             ValueError: 不支持的格式
+            RuntimeError: 转换失败或超时
         """
         input_path = Path(input_path)
         target_format = target_format.lower()
@@ -426,7 +588,8 @@ class SubtitleProcessor:
         if target_format not in valid_formats:
             raise ValueError(f"不支持的格式: {target_format}，支持的格式: {', '.join(valid_formats.keys())}")
             
-        return valid_formats[target_format](input_path)
+        with stage('convert'):
+            return valid_formats[target_format](input_path, deadline)
 
     def update_error_stats(self, error_type: str):
         """更新错误统计"""
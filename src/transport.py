@@ -0,0 +1,307 @@
+import io
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit, parse_qsl
+import yt_dlp
+from yt_dlp.networking import Request, Response
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    path_key TEXT NOT NULL,
+    request_body BLOB,
+    status INTEGER NOT NULL,
+    reason TEXT,
+    response_url TEXT,
+    headers TEXT,
+    body BLOB,
+    error TEXT,
+    latency REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_exchanges_key ON exchanges(key, id);
+CREATE INDEX IF NOT EXISTS idx_exchanges_path ON exchanges(method, path_key, id);
+"""
+
+# 响应体已由 yt-dlp 解压，回放时不能再声明压缩编码和原始长度
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+# 标识请求对象的字段（视频、播放列表、字幕语言等），模糊匹配时必须完全一致
+IDENTITY_FIELDS = {
+    'v', 'id', 'list', 'lang', 'tlang', 'kind', 'fmt',
+    'videoId', 'playlistId', 'browseId'
+}
+
+
+def _request_body(req: Request) -> bytes:
+    """请求体（只记录 bytes，流式请求体无法在不消费的情况下读取）"""
+    data = req.data
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return bytes(data) if isinstance(data, (bytes, bytearray)) else b''
+
+
+def request_key(method: str, url: str, body: bytes) -> str:
+    """请求键: 方法 + URL + 请求体哈希"""
+    return hashlib.sha1(
+        f"{method} {url} {hashlib.sha1(body).hexdigest()}".encode('utf-8')
+    ).hexdigest()
+
+
+def path_key(url: str) -> str:
+    """不含查询参数的 URL，用于请求参数变化时的模糊匹配"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def _fingerprint(url: str, body: bytes) -> set:
+    """请求特征：查询参数和 JSON 请求体的叶子字段（如 innertube 请求中的 videoId）"""
+    features = {f"q:{k}={v}" for k, v in parse_qsl(urlsplit(url).query, keep_blank_values=True)}
+    if not body:
+        return features
+    try:
+        stack = [('', json.loads(body))]
+    except ValueError:
+        features.add(f"body:{hashlib.sha1(body).hexdigest()}")
+        return features
+    while stack:
+        prefix, value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend((f"{prefix}.{k}", v) for k, v in value.items())
+        elif isinstance(value, list):
+            stack.extend((f"{prefix}[]", v) for v in value)
+        else:
+            features.add(f"b:{prefix}={value}")
+    return features
+
+
+def _identity(features: set) -> set:
+    """请求特征中的标识字段（查询参数名或 JSON 叶子字段名属于 IDENTITY_FIELDS）"""
+    identity = set()
+    for feature in features:
+        name = feature.split(':', 1)[-1].split('=', 1)[0]
+        if name.rsplit('.', 1)[-1].replace('[]', '') in IDENTITY_FIELDS:
+            identity.add(feature)
+    return identity
+
+
+class TransportArchive:
+    """yt-dlp 网络请求的录制存档（SQLite）
+
+    录制模式下保存每个请求的状态码、响应头、响应体和耗时；
+    回放模式下按请求键返回录制的响应，同一请求录制了多次时按录制顺序依次返回（之后重复最后一次）。
+    请求键不匹配时（如查询参数中含时间戳），在同一路径、标识字段（视频ID、语言等）完全相同的录制中
+    选择查询参数和请求体最相近的一条；没有标识字段相同的录制时视为不在存档中。
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cursors: Dict[str, int] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.db_path.parent.mkdir(exist_ok=True, parents=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def record(self, req: Request, latency: float, response: Optional[Response] = None,
+               body: bytes = b'', error: Optional[str] = None):
+        """保存一次请求（response 为 None 表示网络错误）"""
+        request_body = _request_body(req)
+        headers = {}
+        if response is not None:
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS}
+        self._connect().execute(
+            'INSERT INTO exchanges (key, method, url, path_key, request_body, status, reason, response_url, '
+            'headers, body, error, latency, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (request_key(req.method, req.url, request_body), req.method, req.url, path_key(req.url),
+             request_body,
+             response.status if response is not None else 0,
+             response.reason if response is not None else None,
+             response.url if response is not None else None,
+             json.dumps(headers), body, error, latency, time.time())
+        )
+
+    def lookup(self, req: Request) -> Optional[sqlite3.Row]:
+        """查找录制的响应，找不到时返回 None"""
+        conn = self._connect()
+        request_body = _request_body(req)
+        key = request_key(req.method, req.url, request_body)
+        rows = conn.execute('SELECT * FROM exchanges WHERE key = ? ORDER BY id', (key,)).fetchall()
+        if rows:
+            with self._lock:
+                position = self._cursors.get(key, 0)
+                self._cursors[key] = position + 1
+            return rows[min(position, len(rows) - 1)]
+
+        candidates = conn.execute(
+            'SELECT * FROM exchanges WHERE method = ? AND path_key = ? ORDER BY id',
+            (req.method, path_key(req.url))
+        ).fetchall()
+        if not candidates:
+            return None
+        wanted = _fingerprint(req.url, request_body)
+        identity = _identity(wanted)
+        best, best_score = None, -1
+        for row in candidates:
+            features = _fingerprint(row['url'], row['request_body'] or b'')
+            if _identity(features) != identity:
+                # 不能用其他视频或语言的录制代替
+                continue
+            score = len(wanted & features)
+            # 得分相同时保留最早录制的
+            if score > best_score:
+                best, best_score = row, score
+        return best
+
+    def reset(self):
+        """重置回放顺序"""
+        with self._lock:
+            self._cursors.clear()
+
+    def clear(self):
+        """删除所有录制"""
+        self._connect().execute('DELETE FROM exchanges')
+        self.reset()
+
+    def stats(self) -> Dict:
+        row = self._connect().execute(
+            'SELECT COUNT(*), COUNT(DISTINCT key), COALESCE(SUM(LENGTH(body)), 0), '
+            'COALESCE(SUM(latency), 0), SUM(status = 0 OR status >= 400) FROM exchanges'
+        ).fetchone()
+        return {
+            'path': str(self.db_path),
+            'exchanges': row[0],
+            'distinct_requests': row[1],
+            'body_bytes': row[2],
+            'recorded_latency_seconds': round(row[3], 3),
+            'errors': row[4] or 0
+        }
+
+
+transport_archive = TransportArchive(config.TRANSPORT_ARCHIVE)
+
+
+def _as_request(req) -> Optional[Request]:
+    if isinstance(req, str):
+        return Request(req)
+    return req if isinstance(req, Request) else None
+
+
+class RecordingYoutubeDL(yt_dlp.YoutubeDL):
+    """录制模式：正常访问网络，同时把每个请求的响应写入存档"""
+
+    def urlopen(self, req):
+        req = _as_request(req) or req
+        if not isinstance(req, Request):
+            return super().urlopen(req)
+
+        # yt-dlp 会修改请求对象（规范化 URL 等），先保存录制用的副本
+        recorded = req.copy()
+        started = time.perf_counter()
+        try:
+            response = super().urlopen(req)
+            body = response.read()
+        except HTTPError as e:
+            body = e.response.read()
+            transport_archive.record(recorded, time.perf_counter() - started, e.response, body)
+            # 原响应体已读取，换成可重复读取的副本再抛出
+            raise HTTPError(_replay_response(e.response.url, e.response.headers, body,
+                                             e.response.status, e.response.reason)) from e
+        except TransportError as e:
+            transport_archive.record(recorded, time.perf_counter() - started, error=str(e))
+            raise
+
+        transport_archive.record(recorded, time.perf_counter() - started, response, body)
+        return _replay_response(response.url, response.headers, body, response.status, response.reason)
+
+
+class ReplayingYoutubeDL(yt_dlp.YoutubeDL):
+    """回放模式：不访问网络，从存档返回录制的响应，并按录制耗时 × TRANSPORT_LATENCY_SCALE 延迟返回"""
+
+    def urlopen(self, req):
+        req = _as_request(req)
+        if req is None:
+            raise TransportError('回放模式只支持 yt_dlp.networking.Request 请求')
+
+        row = transport_archive.lookup(req)
+        if row is None:
+            logger.error(f"回放存档中没有该请求: {req.method} {req.url}")
+            raise TransportError(f'回放存档中没有该请求: {req.method} {req.url}')
+
+        delay = row['latency'] * config.TRANSPORT_LATENCY_SCALE
+        if delay > 0:
+            time.sleep(delay)
+        if row['status'] == 0:
+            raise TransportError(row['error'] or '录制的网络错误')
+
+        response = _replay_response(row['response_url'] or req.url, json.loads(row['headers'] or '{}'),
+                                    row['body'] or b'', row['status'], row['reason'])
+        if row['status'] >= 400:
+            raise HTTPError(response)
+        return response
+
+
+def _replay_response(url: str, headers, body: bytes, status: int, reason: Optional[str]) -> Response:
+    headers = {k: v for k, v in dict(headers).items() if k.lower() not in DROPPED_HEADERS}
+    headers['Content-Length'] = str(len(body))
+    return Response(fp=io.BytesIO(body), url=url, headers=headers, status=status, reason=reason)
+
+
+YOUTUBEDL_CLASSES = {
+    'live': yt_dlp.YoutubeDL,
+    'record': RecordingYoutubeDL,
+    'replay': ReplayingYoutubeDL
+}
+
+
+def create_youtubedl(opts: Dict) -> yt_dlp.YoutubeDL:
+    """按 TRANSPORT_MODE 创建 YoutubeDL 实例（live / record / replay）"""
+    mode = config.TRANSPORT_MODE
+    if mode not in YOUTUBEDL_CLASSES:
+        raise ValueError(f"无效的 TRANSPORT_MODE: {mode}，可选值: {', '.join(YOUTUBEDL_CLASSES)}")
+    if mode != 'live':
+        # 禁用 yt-dlp 的磁盘缓存（播放器签名等），保证录制和回放时发出的请求一致
+        opts = dict(opts, cachedir=False)
+    return YOUTUBEDL_CLASSES[mode](opts)
+
+
+def main(argv=None):
+    """命令行入口: python -m src.transport stats|clear"""
+    parser = argparse.ArgumentParser(description='yt-dlp 网络请求录制存档')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='查看存档统计')
+    subparsers.add_parser('clear', help='删除所有录制')
+    args = parser.parse_args(argv)
+
+    if args.command == 'clear':
+        transport_archive.clear()
+    print(transport_archive.stats())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
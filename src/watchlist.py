@@ -0,0 +1,329 @@
+import re
+import time
+import fcntl
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+from .config import config
+from .deadline import Deadline
+from .ydl import list_videos
+from .subtitle import SubtitleProcessor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    convert_to TEXT NOT NULL DEFAULT '',
+    interval_minutes REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_refresh_at REAL,
+    next_refresh_at REAL NOT NULL,
+    last_status TEXT,
+    last_error TEXT,
+    UNIQUE (url, lang, convert_to)
+);
+CREATE TABLE IF NOT EXISTS watch_videos (
+    watch_id INTEGER NOT NULL REFERENCES watches(id) ON DELETE CASCADE,
+    video_id TEXT NOT NULL,
+    fetched_at REAL,
+    status TEXT,
+    error TEXT,
+    PRIMARY KEY (watch_id, video_id)
+);
+"""
+
+CHANNEL_REGEX = re.compile(r'youtube\.com/(?:@[^/?#]+|channel/[\w-]+|c/[^/?#]+|user/[^/?#]+)')
+CHANNEL_TAB_REGEX = re.compile(r'/(?:videos|streams|shorts|live)/?$')
+
+
+def detect_kind(url: str) -> Optional[str]:
+    """识别 URL 类型: video / playlist / channel，无法识别时返回 None"""
+    if 'list=' in url:
+        return 'playlist'
+    if CHANNEL_REGEX.search(url):
+        return 'channel'
+    if SubtitleProcessor.YT_REGEX.match(url):
+        return 'video'
+    return None
+
+
+def parse_offpeak_hours(value: str) -> List[tuple]:
+    """解析闲时时段，如 "1-6" 或 "22-2,13-14"（按本地时间小时，左闭右开）"""
+    windows = []
+    for part in filter(None, (p.strip() for p in (value or '').split(','))):
+        start, end = (int(h) % 24 for h in part.split('-', 1))
+        windows.append((start, end))
+    return windows
+
+
+def in_offpeak(windows: List[tuple], hour: Optional[int] = None) -> bool:
+    """当前是否处于闲时时段，未配置时段时始终为 True"""
+    if not windows:
+        return True
+    hour = time.localtime().tm_hour if hour is None else hour
+    for start, end in windows:
+        if start <= end and start <= hour < end:
+            return True
+        if start > end and (hour >= start or hour < end):
+            return True
+    return False
+
+
+class RateLimiter:
+    """令牌桶限速，限制预取对 YouTube 的请求速率"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_event: Optional[threading.Event] = None) -> bool:
+        """等待下一个令牌，stop_event 被设置时返回 False"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+        if wait and stop_event is not None:
+            return not stop_event.wait(wait)
+        time.sleep(wait)
+        return True
+
+
+class Watchlist:
+    """观察列表存储（SQLite），记录需要定期预取的视频、播放列表和频道"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(exist_ok=True, parents=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params=()) -> int:
+        """执行写操作，返回影响的行数"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(sql, params).rowcount
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def add(self, url: str, lang: str = 'en', convert_to: Optional[str] = None,
+            interval_minutes: float = None) -> Dict:
+        """添加观察项（已存在时更新刷新间隔），新项目会在下一个调度周期立即预取
+        Raises:
+            ValueError: URL 无法识别或参数无效
+        """
+        kind = detect_kind(url)
+        if kind is None:
+            raise ValueError(f"无法识别的YouTube URL（支持视频、播放列表、频道）: {url}")
+        interval_minutes = float(interval_minutes or config.WATCHLIST_DEFAULT_INTERVAL_MINUTES)
+        if interval_minutes < config.WATCHLIST_MIN_INTERVAL_MINUTES:
+            raise ValueError(f"刷新间隔不能小于 {config.WATCHLIST_MIN_INTERVAL_MINUTES} 分钟")
+        if kind == 'channel' and not CHANNEL_TAB_REGEX.search(url):
+            url = url.rstrip('/') + '/videos'
+
+        now = time.time()
+        self._execute(
+            'INSERT INTO watches (url, kind, lang, convert_to, interval_minutes, created_at, next_refresh_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (url, lang, convert_to) DO UPDATE SET interval_minutes = excluded.interval_minutes',
+            (url, kind, lang, (convert_to or '').lower(), interval_minutes, now, now)
+        )
+        return self._query(
+            'SELECT * FROM watches WHERE url = ? AND lang = ? AND convert_to = ?',
+            (url, lang, (convert_to or '').lower())
+        )[0]
+
+    def remove(self, watch_id: int) -> bool:
+        return self._execute('DELETE FROM watches WHERE id = ?', (watch_id,)) == 1
+
+    def mark_due(self, watch_id: int) -> bool:
+        """立即刷新（在下一个调度周期处理）"""
+        return self._execute(
+            'UPDATE watches SET next_refresh_at = ? WHERE id = ?', (time.time(), watch_id)
+        ) == 1
+
+    def due(self) -> List[Dict]:
+        """到期需要刷新的观察项"""
+        return self._query(
+            'SELECT * FROM watches WHERE next_refresh_at <= ? ORDER BY next_refresh_at', (time.time(),)
+        )
+
+    def record_video(self, watch_id: int, video_id: str, status: str, error: Optional[str] = None,
+                     fetched_at: Optional[float] = None):
+        """记录视频预取结果，fetched_at 默认为当前时间（失败时不更新）"""
+        if fetched_at is None and status == 'success':
+            fetched_at = time.time()
+        self._execute(
+            'INSERT INTO watch_videos (watch_id, video_id, fetched_at, status, error) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (watch_id, video_id) DO UPDATE SET '
+            'fetched_at = COALESCE(excluded.fetched_at, fetched_at), status = excluded.status, error = excluded.error',
+            (watch_id, video_id, fetched_at, status, error)
+        )
+
+    def record_refresh(self, watch: Dict, status: str, error: Optional[str] = None):
+        now = time.time()
+        self._execute(
+            'UPDATE watches SET last_refresh_at = ?, next_refresh_at = ?, last_status = ?, last_error = ? '
+            'WHERE id = ?',
+            (now, now + watch['interval_minutes'] * 60, status, error, watch['id'])
+        )
+
+    def stats(self) -> Dict:
+        """观察列表新鲜度统计"""
+        now = time.time()
+        watches = self._query('SELECT * FROM watches ORDER BY id')
+        video_rows = self._query('SELECT * FROM watch_videos')
+
+        videos_by_watch = {}
+        for row in video_rows:
+            videos_by_watch.setdefault(row['watch_id'], []).append(row)
+
+        total_videos = fresh_videos = 0
+        for watch in watches:
+            max_age = watch['interval_minutes'] * 60
+            videos = videos_by_watch.get(watch['id'], [])
+            ages = [now - v['fetched_at'] for v in videos if v['fetched_at']]
+            fresh = sum(1 for age in ages if age < max_age)
+            watch.update({
+                'convert_to': watch['convert_to'] or None,
+                'video_count': len(videos),
+                'fresh_count': fresh,
+                'failed_count': sum(1 for v in videos if v['status'] != 'success'),
+                'oldest_age_seconds': round(max(ages), 1) if ages else None,
+                'overdue_seconds': round(max(0.0, now - watch['next_refresh_at']), 1)
+            })
+            total_videos += len(videos)
+            fresh_videos += fresh
+
+        return {
+            'watches': watches,
+            'summary': {
+                'watch_count': len(watches),
+                'video_count': total_videos,
+                'fresh_count': fresh_videos,
+                'fresh_ratio': round(fresh_videos / total_videos, 4) if total_videos else None
+            }
+        }
+
+
+watchlist = Watchlist(config.WATCHLIST_PATH)
+
+
+class WatchlistScheduler:
+    """后台预取调度器
+
+    在闲时时段内按刷新间隔预取观察项中的新视频和过期字幕，写入缓存（包括多进程共享的磁盘缓存），
+    客户端后续请求直接命中缓存。多个 Web 进程中只有持有文件锁的一个会执行预取。
+    """
+
+    def __init__(self, store: Watchlist, processor):
+        self.store = store
+        self.processor = processor
+        self.limiter = RateLimiter(config.WATCHLIST_RATE_PER_MINUTE)
+        self.offpeak = parse_offpeak_hours(config.WATCHLIST_OFFPEAK_HOURS)
+        self.lock_path = Path(str(store.db_path) + '.lock')
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='watchlist-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _acquire_leader(self) -> bool:
+        """获取调度文件锁，持有锁的进程退出后其他进程可以接管"""
+        if self._lock_file is not None:
+            return True
+        self.lock_path.parent.mkdir(exist_ok=True, parents=True)
+        lock_file = open(self.lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("已获得预取调度锁，开始执行观察列表预取")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(config.WATCHLIST_TICK_SECONDS):
+            try:
+                if not self._acquire_leader() or not in_offpeak(self.offpeak):
+                    continue
+                for watch in self.store.due():
+                    if self._stop.is_set() or not in_offpeak(self.offpeak):
+                        break
+                    self.refresh_watch(watch)
+            except Exception as e:
+                logger.error(f"观察列表调度失败: {e}")
+
+    def refresh_watch(self, watch: Dict):
+        """刷新单个观察项：预取新视频，重新获取超过刷新间隔的字幕"""
+        logger.info(f"开始刷新观察项 {watch['id']}: {watch['url']}")
+        try:
+            if watch['kind'] == 'video':
+                video_ids = [self.processor.extract_video_id(watch['url'])]
+            else:
+                self.limiter.acquire(self._stop)
+                video_ids = list_videos(
+                    watch['url'], config.WATCHLIST_MAX_VIDEOS, Deadline(config.REQUEST_TIMEOUT)
+                )
+        except Exception as e:
+            logger.error(f"获取观察项视频列表失败: {watch['url']}, 错误: {e}")
+            self.store.record_refresh(watch, 'error', str(e))
+            return
+
+        max_age = watch['interval_minutes'] * 60
+        fetched = failed = 0
+        for video_id in video_ids:
+            age = self.processor.disk_cache_age(video_id, watch['lang'])
+            if age is not None and age < max_age:
+                # 已被其他请求缓存且仍然新鲜
+                self.store.record_video(watch['id'], video_id, 'success', fetched_at=time.time() - age)
+                continue
+            if not self.limiter.acquire(self._stop):
+                return
+            if not in_offpeak(self.offpeak):
+                # 离开闲时时段，保持到期状态，下一个时段继续
+                logger.info(f"已离开闲时时段，暂停刷新观察项 {watch['id']}")
+                return
+
+            result = self.processor.process_single(
+                f"https://www.youtube.com/watch?v={video_id}",
+                watch['lang'],
+                watch['convert_to'] or None,
+                Deadline(config.REQUEST_TIMEOUT),
+                refresh=age is not None
+            )
+            status = result.get('status')
+            self.store.record_video(watch['id'], video_id, status, result.get('message'))
+            if status == 'success':
+                fetched += 1
+            else:
+                failed += 1
+
+        logger.info(f"观察项 {watch['id']} 刷新完成: {len(video_ids)} 个视频, 预取 {fetched} 个, 失败 {failed} 个")
+        self.store.record_refresh(watch, 'success' if not failed else 'partial')
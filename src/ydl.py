@@ -0,0 +1,86 @@
+import logging
+from typing import Dict, List, Optional
+from .config import config
+from .deadline import Deadline
+from .profiler import stage
+from .transport import create_youtubedl
+
+logger = logging.getLogger(__name__)
+
+# yt-dlp 默认的提取重试次数
+MAX_RETRIES = 3
+
+
+def budget_opts(opts: Dict, budget: Deadline) -> Dict:
+    """按阶段剩余预算设置 socket 超时和重试次数
+
+    每次请求的超时为 SOCKET_TIMEOUT（不超过剩余预算），
+    重试次数为剩余预算还能容纳的请求次数，剩余预算不足两次请求时不重试，
+    避免 yt-dlp 的内部重试（默认提取 3 次、下载 10 次）超出请求截止时间。
+    """
+    # 预算刚创建时 remaining() 略小于阶段预算，按 0.1 秒取整
+    remaining = round(budget.remaining(), 1)
+    socket_timeout = max(min(config.SOCKET_TIMEOUT, remaining), 1)
+    retries = min(max(int(remaining // socket_timeout) - 1, 0), MAX_RETRIES)
+    return dict(
+        opts,
+        socket_timeout=socket_timeout,
+        extractor_retries=retries,
+        retries=retries,
+        fragment_retries=retries
+    )
+
+
+def extract_subtitles(opts: Dict, url: str, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+    """调用 yt-dlp 提取视频信息并下载字幕
+
+    指定 deadline 时分两个阶段执行：元数据提取和字幕下载，
+    每个阶段的预算取 EXTRACT_TIMEOUT / DOWNLOAD_TIMEOUT 与请求剩余时间中较小的一个，
+    socket 超时和重试次数由阶段预算决定（见 budget_opts）。
+    Raises:
+        DeadlineExceeded: 请求时间预算已用完
+    """
+    if deadline is None:
+        with stage('extract'), create_youtubedl(opts) as ydl:
+            return ydl.extract_info(url, download=True)
+
+    # 1. 元数据提取
+    extract_deadline = deadline.stage(config.EXTRACT_TIMEOUT)
+    extract_deadline.check('extract')
+    with stage('extract'), create_youtubedl(budget_opts(opts, extract_deadline)) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if info is None:
+        # ignoreerrors 模式下出错返回 None，超时也表现为这种情况
+        deadline.check('extract')
+        return None
+
+    # 2. 字幕下载（复用已提取的信息，不再重新请求页面）
+    download_deadline = deadline.stage(config.DOWNLOAD_TIMEOUT)
+    download_deadline.check('download')
+    with stage('download'), create_youtubedl(budget_opts(opts, download_deadline)) as ydl:
+        return ydl.process_ie_result(ydl.sanitize_info(info, remove_private_keys=True), download=True)
+
+
+def list_videos(url: str, limit: int, deadline: Optional[Deadline] = None) -> List[str]:
+    """列出播放列表或频道中最新的视频ID（只做扁平提取，不下载任何内容）"""
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+        'playlistend': limit,
+        'ignoreerrors': True
+    }
+    if deadline is not None:
+        deadline.check('list')
+        opts = budget_opts(opts, deadline.stage(config.EXTRACT_TIMEOUT))
+    with stage('list'), create_youtubedl(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if not info:
+        return []
+    if info.get('_type') not in ('playlist', 'multi_video'):
+        return [info['id']] if info.get('id') else []
+    return [
+        entry['id'] for entry in (info.get('entries') or [])
+        if entry and entry.get('id') and len(entry['id']) == 11
+    ][:limit]